@@ -2,17 +2,18 @@
 import asyncio
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
 from apscheduler.schedulers.background import BackgroundScheduler
 from pathlib import Path
 
-from config import DB_PATH, HOST, PORT, SYNC_SCHEDULE
-from indexer.database import Database
+from config import DB_PATH, HOST, PORT, SYNC_SCHEDULE, THREAD_POOL_SIZE
+from indexer.db_instance import db
 from indexer.sync import run_sync, run_sync_blocking
-from backend.search import router as search_router
+from backend.search import router as search_router, invalidate_cache
 
 # Logging
 logging.basicConfig(
@@ -21,8 +22,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database
-db = Database(DB_PATH)
+# Database (shared with backend.search)
 db.initialize()
 
 # FastAPI app
@@ -30,6 +30,7 @@ app = FastAPI(
     title="Myrient Search Engine",
     description="Lightweight search engine for the Myrient game archive",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Mount API routes
@@ -53,7 +54,7 @@ async def index():
 @app.post("/api/sync")
 async def trigger_sync(full: bool = False):
     """Trigger a manual sync. Use full=true for complete re-crawl."""
-    state = db.get_crawl_state()
+    state = await asyncio.to_thread(db.get_crawl_state)
     if state and state.get("status") == "crawling":
         return JSONResponse(
             status_code=409,
@@ -63,7 +64,7 @@ async def trigger_sync(full: bool = False):
     # Run in background thread to not block the server
     thread = threading.Thread(
         target=run_sync_blocking,
-        args=(db, full),
+        args=(db, full, invalidate_cache),
         daemon=True
     )
     thread.start()
@@ -87,7 +88,7 @@ def _setup_scheduler():
         scheduler.add_job(
             run_sync_blocking,
             "cron",
-            args=[db, False],
+            args=[db, False, invalidate_cache],
             minute=minute,
             hour=hour,
             day=day if day != "*" else None,
@@ -109,6 +110,12 @@ async def startup():
     logger.info("Myrient Search Engine starting up")
     logger.info("Database: %s", DB_PATH)
 
+    # API handlers push their SQLite calls onto the default executor;
+    # size it explicitly instead of relying on asyncio's CPU-based default.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="db")
+    )
+
     # Reset stale crawl state — if the container was stopped mid-crawl,
     # the status remains "crawling" which blocks everything: the frontend
     # polls /api/sync/status forever, manual sync returns 409, and
@@ -121,15 +128,27 @@ async def startup():
     # ── Schema migrations (idempotent) ──
     db.migrate_add_content_hash()
     db.migrate_add_last_modified_index()
-    normalized = db.migrate_normalize_dates()
-    if normalized:
-        logger.info("Startup: normalized %d date values to ISO 8601", normalized)
+    db.migrate_add_browse_index()
+    db.migrate_populate_filter_stats()
+    if db.has_misparented_files():
+        db.migrate_fix_file_parent_paths()
+    if db.has_unnormalized_dates():
+        normalized = db.migrate_normalize_dates()
+        if normalized:
+            logger.info("Startup: normalized %d date values to ISO 8601", normalized)
+    else:
+        logger.info("Startup: date normalization skipped — nothing to migrate")
 
     # Clean up any './' duplicate entries left from previous crawls
-    cleanup_result = db.cleanup_dotslash_duplicates()
-    if cleanup_result["total_removed"] > 0:
-        logger.info("Startup cleanup: removed %d duplicate entries (had './' in path)",
-                     cleanup_result["total_removed"])
+    if db.has_dotslash_entries():
+        cleanup_result = db.cleanup_dotslash_duplicates()
+        if cleanup_result["total_removed"] > 0:
+            logger.info("Startup cleanup: removed %d duplicate entries (had './' in path)",
+                         cleanup_result["total_removed"])
+    else:
+        logger.info("Startup: './' cleanup skipped — nothing to migrate")
+
+    db.optimize(merge_fts=False)
 
     stats = db.get_stats()
     logger.info("Current index: %d files, %d dirs", stats["total_files"], stats["total_dirs"])
@@ -141,7 +160,7 @@ async def startup():
         logger.info("Database is empty — starting initial crawl in background")
         thread = threading.Thread(
             target=run_sync_blocking,
-            args=(db, True),
+            args=(db, True, invalidate_cache),
             daemon=True
         )
         thread.start()
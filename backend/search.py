@@ -1,19 +1,61 @@
-"""Search API endpoints."""
+"""Search API endpoints.
+
+SQLite calls are blocking, so every handler runs its database work in the
+default thread pool (asyncio.to_thread) to keep the event loop free.
+"""
+import asyncio
+import functools
 import logging
+import time
+from typing import Any
+
 from fastapi import APIRouter, Query, HTTPException
-from indexer.database import Database
+from indexer.db_instance import db
 from backend.models import (
-    SearchResponse, CollectionInfo, PlatformInfo, StatsResponse, CrawlStatusResponse
+    EntryResult, SearchResponse, CollectionInfo, PlatformInfo, StatsResponse, CrawlStatusResponse
 )
-from config import DB_PATH, RESULTS_PER_PAGE, MYRIENT_BASE_URL
+from config import RESULTS_PER_PAGE, MYRIENT_BASE_URL, CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
-db = Database(DB_PATH)
-
 
-@router.get("/search", response_model=SearchResponse)
+# ── Response cache ──────────────────────────────────────────────────────
+# Filter lists and index counts only change when a crawl writes to the
+# index, yet the frontend requests them on every page load. Keep them
+# in-process for CACHE_TTL seconds; invalidate_cache() drops everything
+# when a sync starts or ends and after a cleanup so fresh data shows up
+# immediately. Crawl state is never cached.
+
+_cache: dict[tuple, tuple[float, Any]] = {}
+
+
+def ttl_cache(seconds: float):
+    """Cache an async handler's result per argument set for `seconds`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            hit = _cache.get(key)
+            if hit and hit[0] > now:
+                return hit[1]
+            value = await fn(*args, **kwargs)
+            _cache[key] = (now + seconds, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidate_cache():
+    """Drop all cached responses (call after the index changes)."""
+    _cache.clear()
+
+
+# Rows come straight from our own schema, so the response is built with
+# model_construct and FastAPI's response validation is turned off
+# (response_model=None); the model is still advertised in the OpenAPI docs.
+@router.get("/search", response_model=None, responses={200: {"model": SearchResponse}})
 async def search(
     q: str = Query(..., min_length=1, description="Search query"),
     collection: str | None = Query(None, description="Filter by collection"),
@@ -27,7 +69,8 @@ async def search(
 ):
     """Full-text search across all indexed Myrient entries."""
     try:
-        result = db.search(
+        result = await asyncio.to_thread(
+            db.search,
             query=q,
             collection=collection,
             platform=platform,
@@ -38,7 +81,11 @@ async def search(
             page=page,
             per_page=per_page,
         )
-        return SearchResponse(**result)
+        result["results"] = [
+            EntryResult.model_construct(**{**r, "is_directory": bool(r["is_directory"])})
+            for r in result["results"]
+        ]
+        return SearchResponse.model_construct(**result)
     except Exception as e:
         logger.warning("Search error for query '%s': %s", q, e)
         # Return empty results instead of 500 for query parsing errors
@@ -46,42 +93,55 @@ async def search(
 
 
 @router.get("/collections", response_model=list[CollectionInfo])
+@ttl_cache(CACHE_TTL)
 async def collections():
     """List all collections with file counts."""
-    return db.get_collections()
+    return await asyncio.to_thread(db.get_collections)
 
 
 @router.get("/platforms", response_model=list[PlatformInfo])
+@ttl_cache(CACHE_TTL)
 async def platforms(
     collection: str | None = Query(None, description="Filter by collection"),
 ):
     """List all platforms, optionally filtered by collection."""
-    return db.get_platforms(collection)
+    return await asyncio.to_thread(db.get_platforms, collection)
 
 
 @router.get("/manufacturers")
+@ttl_cache(CACHE_TTL)
 async def manufacturers():
     """List manufacturers with their platforms grouped, for the two-tier filter."""
-    return db.get_manufacturers()
+    return await asyncio.to_thread(db.get_manufacturers)
 
 
 @router.get("/browse")
 async def browse(path: str = Query("", description="Directory path to browse")):
     """Browse entries in a specific directory."""
-    entries = db.browse(path)
+    entries = await asyncio.to_thread(db.browse, path)
     return {"path": path, "entries": entries}
 
 
+@ttl_cache(CACHE_TTL)
+async def _index_counts():
+    return await asyncio.to_thread(db.get_index_counts)
+
+
 @router.get("/stats", response_model=StatsResponse)
 async def stats():
-    """Database statistics."""
-    return db.get_stats()
+    """Database statistics.
+
+    The counts may be up to CACHE_TTL old; crawl_status and last_synced
+    are read fresh, since the sync banner and footer are driven by them.
+    """
+    counts = await _index_counts()
+    return {**counts, **await asyncio.to_thread(db.get_sync_summary)}
 
 
 @router.get("/sync/status", response_model=CrawlStatusResponse)
 async def sync_status():
     """Current crawl/sync status."""
-    state = db.get_crawl_state()
+    state = await asyncio.to_thread(db.get_crawl_state)
     if not state:
         return CrawlStatusResponse(status="unknown")
     return CrawlStatusResponse(**{
@@ -96,7 +156,8 @@ async def cleanup():
     Safe to run multiple times — idempotent. Returns counts of what was cleaned.
     """
     try:
-        result = db.cleanup_dotslash_duplicates()
+        result = await asyncio.to_thread(db.cleanup_dotslash_duplicates)
+        invalidate_cache()
         return result
     except Exception as e:
         logger.error("Cleanup failed: %s", e)
@@ -108,35 +169,28 @@ async def recently_added(
     days: int = Query(30, ge=1, le=365, description="Number of days to look back"),
     page: int = Query(1, ge=1),
     per_page: int = Query(RESULTS_PER_PAGE, ge=1, le=200),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
 ):
-    """Return files added/modified within the last N days, newest first."""
+    """Return files added/modified within the last N days, newest first.
+
+    Pass the returned next_cursor to fetch the following page without an
+    OFFSET scan; totals are only computed for page/offset requests.
+    """
     from datetime import datetime, timedelta
     cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:00")
 
-    with db.connect() as conn:
-        total = conn.execute(
-            "SELECT COUNT(*) as c FROM entries "
-            "WHERE is_directory = 0 AND last_modified >= ?",
-            (cutoff,)
-        ).fetchone()["c"]
-
-        offset = (page - 1) * per_page
-        rows = conn.execute(
-            "SELECT * FROM entries "
-            "WHERE is_directory = 0 AND last_modified >= ? "
-            "ORDER BY last_modified DESC "
-            "LIMIT ? OFFSET ?",
-            (cutoff, per_page, offset)
-        ).fetchall()
-
-    return {
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "pages": (total + per_page - 1) // per_page if total > 0 else 0,
-        "cutoff": cutoff,
-        "results": [dict(r) for r in rows],
-    }
+    after = None
+    if cursor:
+        last_modified, sep, entry_id = cursor.rpartition("|")
+        if not sep or not entry_id.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = (last_modified, int(entry_id))
+
+    result = await asyncio.to_thread(
+        db.get_recently_added, cutoff, page=page, per_page=per_page, after=after
+    )
+    result["cutoff"] = cutoff
+    return result
 
 
 @router.get("/health")
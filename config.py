@@ -21,7 +21,9 @@ SYNC_SCHEDULE = os.getenv("SYNC_SCHEDULE", "0 3 1 * *")
 # Server
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8080"))
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "16"))  # workers for blocking DB calls
 
 # Search
 RESULTS_PER_PAGE = int(os.getenv("RESULTS_PER_PAGE", "50"))
 MAX_RESULTS = int(os.getenv("MAX_RESULTS", "10000"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))  # seconds to cache filter lists/stats
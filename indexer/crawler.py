@@ -14,18 +14,33 @@ from indexer.parser import parse_directory_listing, build_entry, _normalize_path
 
 logger = logging.getLogger(__name__)
 
-# Batch size for DB inserts
-BATCH_SIZE = 1000
+# Crawled directories are handed to a writer task in batches of about
+# WRITE_BATCH_ROWS rows; workers wait once WRITE_QUEUE_BATCHES batches are
+# queued, which bounds how many unwritten rows the crawl holds in memory.
+WRITE_BATCH_ROWS = 10000
+WRITE_QUEUE_BATCHES = 4
 
 
 class MyrientCrawler:
-    """Async recursive crawler for Myrient file listings."""
+    """Async crawler for Myrient file listings.
 
-    def __init__(self, db: Database, incremental: bool = True):
+    A fixed pool of `concurrency` workers (CRAWL_CONCURRENCY by default)
+    pulls directory paths from a queue and pushes back the subdirectories
+    it finds, so the number of in-flight coroutines stays bounded however
+    large the tree is.
+    """
+
+    def __init__(self, db: Database, incremental: bool = True,
+                 concurrency: int = CRAWL_CONCURRENCY):
         self.db = db
         self.incremental = incremental
-        self.semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+        self.concurrency = concurrency
         self.delay = CRAWL_DELAY_MS / 1000.0
+        # Directory writes not yet handed to the writer task (see crawl())
+        self._pending_writes: list[tuple] = []
+        self._pending_rows = 0
+        self._write_queue: asyncio.Queue | None = None
+        self._writer: asyncio.Task | None = None
         self.stats = {
             "dirs_crawled": 0,
             "dirs_skipped": 0,
@@ -33,8 +48,6 @@ class MyrientCrawler:
             "errors": 0,
             "start_time": 0,
         }
-        self._entry_buffer: list[dict] = []
-        self._buffer_lock = asyncio.Lock()
 
     async def crawl(self):
         """Start the full crawl from the root."""
@@ -47,20 +60,45 @@ class MyrientCrawler:
         )
 
         logger.info("Starting crawl of %s (incremental=%s, concurrency=%d)",
-                     MYRIENT_BASE_URL, self.incremental, CRAWL_CONCURRENCY)
+                     MYRIENT_BASE_URL, self.incremental, self.concurrency)
 
         timeout = aiohttp.ClientTimeout(total=CRAWL_TIMEOUT)
-        connector = aiohttp.TCPConnector(limit=CRAWL_CONCURRENCY, ttl_dns_cache=300)
-
-        async with aiohttp.ClientSession(
-            timeout=timeout,
-            connector=connector,
-            headers={"User-Agent": USER_AGENT}
-        ) as session:
-            await self._crawl_directory(session, "")
+        # Everything is fetched from one host: let every worker keep its
+        # connection alive between requests, so each pays the TCP+TLS
+        # handshake once per crawl instead of once per directory.
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
 
-        # Flush remaining buffer
-        await self._flush_buffer()
+        # Directory writes are batched and committed by a writer task in a
+        # thread, so SQLite work overlaps with fetching instead of blocking
+        # the event loop the workers share.
+        self._write_queue = asyncio.Queue(maxsize=WRITE_QUEUE_BATCHES)
+        self._writer = writer = asyncio.create_task(self._write_batches(self._write_queue))
+        workers = asyncio.create_task(self._run_workers(timeout, connector))
+        try:
+            await asyncio.wait({workers, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if writer.done():
+                # The writer only stops early when a write failed
+                writer.result()
+            await workers
+        finally:
+            try:
+                if not workers.done():
+                    workers.cancel()
+                    await asyncio.gather(workers, return_exceptions=True)
+                if not writer.done():
+                    # Write whatever is still buffered, then stop the writer
+                    await self._hand_off_writes()
+                    await self._put_write(None)
+                # Re-raises a failed write however the crawl ended, so
+                # run_sync records the error instead of staying "crawling"
+                await writer
+            finally:
+                self._write_queue = self._writer = None
 
         elapsed = time.time() - self.stats["start_time"]
         msg = (
@@ -81,23 +119,119 @@ class MyrientCrawler:
             message=msg
         )
 
-    async def _crawl_directory(self, session: aiohttp.ClientSession, rel_path: str):
-        """Crawl a single directory and recurse into subdirectories."""
+    async def _run_workers(self, timeout: aiohttp.ClientTimeout,
+                           connector: aiohttp.TCPConnector):
+        async with aiohttp.ClientSession(
+            timeout=timeout,
+            connector=connector,
+            headers={"User-Agent": USER_AGENT}
+        ) as session:
+            queue: asyncio.Queue[str] = asyncio.Queue()
+            queue.put_nowait("")
+            # Each worker has at most one request in flight, so the pool
+            # size is the fetch concurrency. Leaving the TaskGroup waits for
+            # the cancelled workers (and cancels them if the crawl is).
+            async with asyncio.TaskGroup() as tg:
+                workers = [
+                    tg.create_task(self._worker(session, queue))
+                    for _ in range(self.concurrency)
+                ]
+                await queue.join()
+                for worker in workers:
+                    worker.cancel()
+
+    async def _write_batches(self, queue: asyncio.Queue):
+        """Commit queued directory batches in a thread, in arrival order."""
+        while (batch := await queue.get()) is not None:
+            await asyncio.to_thread(self.db.commit_directories, batch)
+
+    async def _commit_directory(self, *args):
+        """Buffer one directory's write (commit_directory's arguments).
+
+        Each directory's entries and sync_meta still land in the same
+        transaction, so an interrupted crawl never records a directory as
+        synced without its entries.
+        """
+        self._pending_writes.append(args)
+        self._pending_rows += len(args[1]) + 1
+        if self._pending_rows >= WRITE_BATCH_ROWS:
+            await self._hand_off_writes()
+
+    async def _hand_off_writes(self):
+        """Queue the buffered directories, waiting while the writer is behind."""
+        batch = self._pending_writes
+        self._pending_writes, self._pending_rows = [], 0
+        if batch:
+            await self._put_write(batch)
+
+    async def _put_write(self, item):
+        """Put one item on the write queue, unless the writer dies first.
+
+        A failed writer never drains the queue again, so a plain put()
+        into a full queue would wait forever; this raises its error instead.
+        """
+        put = asyncio.create_task(self._write_queue.put(item))
+        try:
+            done, _ = await asyncio.wait({put, self._writer},
+                                         return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            put.cancel()
+            raise
+        if put in done:
+            return
+        put.cancel()
+        self._writer.result()
+        raise RuntimeError("Writer stopped before the crawl finished")
+
+    async def _worker(self, session: aiohttp.ClientSession, queue: asyncio.Queue):
+        """Crawl directories from the queue until cancelled."""
+        while True:
+            rel_path = await queue.get()
+            try:
+                await self._crawl_directory(session, rel_path, queue)
+            except Exception as e:
+                logger.warning("Error crawling %s: %s", rel_path or "/", e)
+                self.stats["errors"] += 1
+            finally:
+                queue.task_done()
+
+    async def _crawl_directory(self, session: aiohttp.ClientSession, rel_path: str,
+                               queue: asyncio.Queue):
+        """Crawl a single directory and queue its subdirectories."""
         # Normalize to strip any stray './' segments before doing anything
         rel_path = _normalize_path(rel_path)
         url = urljoin(MYRIENT_BASE_URL, quote(rel_path, safe="/"))
 
+        # ── Conditional request ──
+        # Echo the validators stored on the last crawl; an unchanged
+        # directory then answers 304 with no body to download or parse.
+        # DB calls go through to_thread: the batch writer can hold the
+        # connection lock for a whole commit, and the loop must not wait on it
+        sync_meta = (await asyncio.to_thread(self.db.get_sync_meta, rel_path)
+                     if self.incremental else None)
+        headers = {}
+        if sync_meta:
+            if sync_meta.get("etag"):
+                headers["If-None-Match"] = sync_meta["etag"]
+            if sync_meta.get("last_modified"):
+                headers["If-Modified-Since"] = sync_meta["last_modified"]
+
         # ── Fetch and parse directory ──
         try:
-            async with self.semaphore:
-                await asyncio.sleep(self.delay)
-                async with session.get(url, allow_redirects=True) as resp:
-                    if resp.status != 200:
-                        logger.warning("HTTP %d for %s", resp.status, url)
-                        self.stats["errors"] += 1
-                        return
-
-                    html = await resp.text()
+            await asyncio.sleep(self.delay)
+            async with session.get(url, headers=headers,
+                                   allow_redirects=True) as resp:
+                not_modified = resp.status == 304 and sync_meta is not None
+                if not not_modified and resp.status != 200:
+                    logger.warning("HTTP %d for %s", resp.status, url)
+                    self.stats["errors"] += 1
+                    return
+
+                if not not_modified:
+                    # Decode the body ourselves, once: listings are UTF-8
+                    # unless the server says otherwise, and one bad byte
+                    # should not fail the whole directory.
+                    html = (await resp.read()).decode(resp.charset or "utf-8", "replace")
                     etag = resp.headers.get("ETag")
                     last_modified = resp.headers.get("Last-Modified")
 
@@ -110,20 +244,25 @@ class MyrientCrawler:
             self.stats["errors"] += 1
             return
 
-        # Parse listing
-        raw_entries = parse_directory_listing(html)
         self.stats["dirs_crawled"] += 1
-
-        # Update crawl state periodically
-        if self.stats["dirs_crawled"] % 100 == 0:
-            elapsed = time.time() - self.stats["start_time"]
-            self.db.update_crawl_state(
-                dirs_crawled=self.stats["dirs_crawled"],
-                files_found=self.stats["files_found"],
-                errors=self.stats["errors"],
-                message=f"Crawling... {self.stats['dirs_crawled']} dirs, "
-                        f"{self.stats['files_found']} files ({elapsed:.0f}s)"
+        await self._report_progress()
+
+        if not_modified:
+            # Nothing changed server-side: reuse the subdirectories indexed
+            # last time to keep descending (children may have changed).
+            self.stats["dirs_skipped"] += 1
+            subdirs = await asyncio.to_thread(self.db.get_subdirectories, rel_path)
+            self.stats["files_found"] += max(
+                0, (sync_meta.get("entry_count") or 0) - len(subdirs)
             )
+            logger.debug("Skipped (HTTP 304): %s", rel_path or "/")
+            for sub in subdirs:
+                queue.put_nowait(sub)
+            return
+
+        # Parse listing in a worker thread: a large page takes tens of
+        # milliseconds of CPU that would otherwise stall every other fetch
+        raw_entries = await asyncio.to_thread(parse_directory_listing, html)
 
         # ── Content-hash change detection ──
         # Compare hash of current listing with stored hash.
@@ -131,12 +270,12 @@ class MyrientCrawler:
         content_hash = Database.compute_content_hash(raw_entries)
         skip_db_writes = False
 
-        if self.incremental:
-            sync_meta = self.db.get_sync_meta(rel_path)
-            if sync_meta and sync_meta.get("content_hash") == content_hash:
-                self.stats["dirs_skipped"] += 1
-                skip_db_writes = True
-                logger.debug("Skipped DB writes (hash match): %s", rel_path or "/")
+        # Second line of defence for servers that ignore the validators.
+        if sync_meta and Database.content_hash_matches(
+                sync_meta.get("content_hash"), content_hash, raw_entries):
+            self.stats["dirs_skipped"] += 1
+            skip_db_writes = True
+            logger.debug("Skipped DB writes (hash match): %s", rel_path or "/")
 
         # Build entries and collect subdirectories
         subdirs = []
@@ -179,30 +318,26 @@ class MyrientCrawler:
                 self.stats["files_found"] += 1
 
         if not skip_db_writes:
-            # Buffer entries for batch insertion
-            async with self._buffer_lock:
-                self._entry_buffer.extend(entries_to_insert)
-                if len(self._entry_buffer) >= BATCH_SIZE:
-                    batch = self._entry_buffer[:BATCH_SIZE]
-                    self._entry_buffer = self._entry_buffer[BATCH_SIZE:]
-                    self.db.insert_entries_batch(batch)
-
-            # Update sync metadata with content hash
-            self.db.upsert_sync_meta(rel_path, etag, last_modified,
-                                     len(raw_entries), content_hash)
-
-            # Remove stale entries (files/dirs no longer listed)
-            if self.incremental:
-                self.db.remove_missing_entries(rel_path, current_names)
-
-        # Recurse into subdirectories concurrently
-        if subdirs:
-            tasks = [self._crawl_directory(session, sub) for sub in subdirs]
-            await asyncio.gather(*tasks, return_exceptions=True)
-
-    async def _flush_buffer(self):
-        """Flush any remaining entries in the buffer."""
-        async with self._buffer_lock:
-            if self._entry_buffer:
-                self.db.insert_entries_batch(self._entry_buffer)
-                self._entry_buffer = []
+            # Entries, stale-entry removal (incremental only) and sync
+            # metadata for a directory always commit together
+            await self._commit_directory(
+                rel_path, entries_to_insert,
+                current_names if self.incremental else None,
+                etag, last_modified, len(raw_entries), content_hash,
+            )
+
+        for sub in subdirs:
+            queue.put_nowait(sub)
+
+    async def _report_progress(self):
+        """Update crawl state every 100 directories."""
+        if self.stats["dirs_crawled"] % 100 == 0:
+            elapsed = time.time() - self.stats["start_time"]
+            await asyncio.to_thread(
+                self.db.update_crawl_state,
+                dirs_crawled=self.stats["dirs_crawled"],
+                files_found=self.stats["files_found"],
+                errors=self.stats["errors"],
+                message=f"Crawling... {self.stats['dirs_crawled']} dirs, "
+                        f"{self.stats['files_found']} files ({elapsed:.0f}s)"
+            )
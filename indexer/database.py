@@ -1,11 +1,14 @@
 """SQLite database with FTS5 full-text search for Myrient entries."""
 import hashlib
+import queue
 import re
 import sqlite3
 import logging
+import threading
 from pathlib import Path
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timezone
+from operator import itemgetter
 
 logger = logging.getLogger(__name__)
 
@@ -39,24 +42,6 @@ CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
     tokenize='unicode61 remove_diacritics 2'
 );
 
--- Triggers to keep FTS in sync
-CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
-    INSERT INTO entries_fts(rowid, name, path, collection, platform, region)
-    VALUES (new.id, new.name, new.path, new.collection, new.platform, new.region);
-END;
-
-CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
-    INSERT INTO entries_fts(entries_fts, rowid, name, path, collection, platform, region)
-    VALUES ('delete', old.id, old.name, old.path, old.collection, old.platform, old.region);
-END;
-
-CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
-    INSERT INTO entries_fts(entries_fts, rowid, name, path, collection, platform, region)
-    VALUES ('delete', old.id, old.name, old.path, old.collection, old.platform, old.region);
-    INSERT INTO entries_fts(rowid, name, path, collection, platform, region)
-    VALUES (new.id, new.name, new.path, new.collection, new.platform, new.region);
-END;
-
 -- Sync metadata for smart incremental updates
 CREATE TABLE IF NOT EXISTS sync_meta (
     path TEXT PRIMARY KEY,
@@ -78,85 +63,426 @@ CREATE TABLE IF NOT EXISTS crawl_state (
     message TEXT
 );
 
+-- Per-collection / per-platform file counts for the filter UI, kept
+-- current by the entries_stats_* triggers below (refresh_filter_stats
+-- recounts from scratch)
+CREATE TABLE IF NOT EXISTS collection_stats (
+    collection TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS platform_stats (
+    platform TEXT NOT NULL,
+    collection TEXT,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (platform, collection)
+);
+
+-- Files only. collection may be NULL in platform_stats, where the primary
+-- key cannot detect duplicates, so those rows are matched with IS and
+-- inserted only when missing rather than via ON CONFLICT.
+CREATE TRIGGER IF NOT EXISTS entries_stats_ai AFTER INSERT ON entries
+WHEN new.is_directory = 0 BEGIN
+    INSERT INTO collection_stats (collection, count)
+    SELECT new.collection, 1 WHERE new.collection IS NOT NULL
+    ON CONFLICT(collection) DO UPDATE SET count = count + 1;
+    UPDATE platform_stats SET count = count + 1
+    WHERE platform = new.platform AND collection IS new.collection;
+    INSERT INTO platform_stats (platform, collection, count)
+    SELECT new.platform, new.collection, 1
+    WHERE new.platform IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM platform_stats
+        WHERE platform = new.platform AND collection IS new.collection);
+END;
+
+CREATE TRIGGER IF NOT EXISTS entries_stats_ad AFTER DELETE ON entries
+WHEN old.is_directory = 0 BEGIN
+    UPDATE collection_stats SET count = count - 1
+    WHERE collection = old.collection;
+    DELETE FROM collection_stats
+    WHERE collection = old.collection AND count <= 0;
+    UPDATE platform_stats SET count = count - 1
+    WHERE platform = old.platform AND collection IS old.collection;
+    DELETE FROM platform_stats
+    WHERE platform = old.platform AND collection IS old.collection AND count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS entries_stats_au
+AFTER UPDATE OF is_directory, collection, platform ON entries
+WHEN old.is_directory IS NOT new.is_directory
+  OR old.collection IS NOT new.collection
+  OR old.platform IS NOT new.platform BEGIN
+    UPDATE collection_stats SET count = count - 1
+    WHERE old.is_directory = 0 AND collection = old.collection;
+    DELETE FROM collection_stats
+    WHERE old.is_directory = 0 AND collection = old.collection AND count <= 0;
+    UPDATE platform_stats SET count = count - 1
+    WHERE old.is_directory = 0
+      AND platform = old.platform AND collection IS old.collection;
+    DELETE FROM platform_stats
+    WHERE old.is_directory = 0
+      AND platform = old.platform AND collection IS old.collection AND count <= 0;
+    INSERT INTO collection_stats (collection, count)
+    SELECT new.collection, 1
+    WHERE new.is_directory = 0 AND new.collection IS NOT NULL
+    ON CONFLICT(collection) DO UPDATE SET count = count + 1;
+    UPDATE platform_stats SET count = count + 1
+    WHERE new.is_directory = 0
+      AND platform = new.platform AND collection IS new.collection;
+    INSERT INTO platform_stats (platform, collection, count)
+    SELECT new.platform, new.collection, 1
+    WHERE new.is_directory = 0 AND new.platform IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM platform_stats
+        WHERE platform = new.platform AND collection IS new.collection);
+END;
+
 -- Indexes for fast filtering
 CREATE INDEX IF NOT EXISTS idx_entries_collection ON entries(collection);
 CREATE INDEX IF NOT EXISTS idx_entries_platform ON entries(platform);
-CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries(parent_path);
+-- Directory listings in browse() order (dirs first, then by name), so
+-- neither browse() nor get_subdirectories() needs a sort step
+CREATE INDEX IF NOT EXISTS idx_entries_parent_listing
+    ON entries(parent_path, is_directory DESC, name);
 CREATE INDEX IF NOT EXISTS idx_entries_is_dir ON entries(is_directory);
 CREATE INDEX IF NOT EXISTS idx_entries_region ON entries(region);
 CREATE INDEX IF NOT EXISTS idx_entries_file_type ON entries(file_type);
 -- Composite index for the most common filter pattern (files-only + collection)
 CREATE INDEX IF NOT EXISTS idx_entries_dir_coll ON entries(is_directory, collection);
+-- Files by date for "recently added"; scanned backwards, the implicit
+-- trailing rowid gives a stable (last_modified, id) DESC keyset order
+CREATE INDEX IF NOT EXISTS idx_entries_lm_files ON entries(last_modified)
+    WHERE is_directory = 0;
+-- Dates not yet in ISO 8601 form, for migrate_normalize_dates; holds
+-- almost nothing once the migration has run
+CREATE INDEX IF NOT EXISTS idx_entries_lm_unnorm ON entries(id)
+    WHERE last_modified NOT LIKE '%T%';
 """
 
+# Kept separate so bulk_load() can drop and recreate them.
+FTS_TRIGGERS_SQL = """
+-- Triggers to keep FTS in sync
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, name, path, collection, platform, region)
+    VALUES (new.id, new.name, new.path, new.collection, new.platform, new.region);
+END;
+
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, name, path, collection, platform, region)
+    VALUES ('delete', old.id, old.name, old.path, old.collection, old.platform, old.region);
+END;
+"""
+FTS_UPDATE_TRIGGER_SQL = """
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, name, path, collection, platform, region)
+    VALUES ('delete', old.id, old.name, old.path, old.collection, old.platform, old.region);
+    INSERT INTO entries_fts(rowid, name, path, collection, platform, region)
+    VALUES (new.id, new.name, new.path, new.collection, new.platform, new.region);
+END;
+"""
+FTS_TRIGGERS_SQL += FTS_UPDATE_TRIGGER_SQL
+FTS_TRIGGERS = ("entries_ai", "entries_ad", "entries_au")
+
 INIT_CRAWL_STATE = """
 INSERT OR IGNORE INTO crawl_state (id, status) VALUES (1, 'idle');
 """
 
+# A true upsert rather than INSERT OR REPLACE: re-crawled rows keep their
+# id (the FTS rowid) and created_at, and fire the update trigger instead of
+# a delete plus an insert.
+INSERT_ENTRIES_SQL = """
+INSERT INTO entries
+    (path, name, is_directory, file_size, last_modified,
+     collection, platform, region, file_type, parent_path, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(path) DO UPDATE SET
+    name = excluded.name,
+    is_directory = excluded.is_directory,
+    file_size = excluded.file_size,
+    last_modified = excluded.last_modified,
+    collection = excluded.collection,
+    platform = excluded.platform,
+    region = excluded.region,
+    file_type = excluded.file_type,
+    parent_path = excluded.parent_path,
+    updated_at = excluded.updated_at
+"""
+
+# Entry dict keys in INSERT_ENTRIES_SQL column order (updated_at is bound
+# separately). Rows are bound as tuples: no per-row dict copy, and no
+# name lookups by the sqlite3 module.
+ENTRY_COLUMNS = ("path", "name", "is_directory", "file_size", "last_modified",
+                 "collection", "platform", "region", "file_type", "parent_path")
+_entry_values = itemgetter(*ENTRY_COLUMNS)
+
+UPSERT_SYNC_META_SQL = """
+INSERT OR REPLACE INTO sync_meta
+    (path, etag, last_modified, last_crawled, entry_count, content_hash)
+VALUES (?, ?, ?, datetime('now'), ?, ?)
+"""
+
+# BM25 column weights, in entries_fts column order:
+# name, path, collection, platform, region.
+# Name matches dominate; path is mostly noise (it repeats every other column).
+BM25_WEIGHTS = (10.0, 1.0, 5.0, 5.0, 2.0)
+# FTS5 rank function, stored as the table's persistent 'rank' option (see
+# migrate_set_fts_rank) so the weighted score is the built-in rank column
+# instead of a bm25() call evaluated separately in SELECT and ORDER BY.
+BM25_RANK = "bm25({})".format(", ".join(str(w) for w in BM25_WEIGHTS))
+
+# Page cache budgets (negative = KiB). These are ceilings, not allocations:
+# SQLite only grows the cache as pages are touched. The writer gets more
+# because bulk upserts dirty index and FTS pages across the whole file.
+READER_CACHE_KIB = 131072   # 128MB per pooled reader
+WRITER_CACHE_KIB = 262144   # 256MB
+MMAP_SIZE = 268435456       # 256MB
+# Page size for newly created databases. Fixed once the file exists (WAL
+# cannot change it), so it only applies on first open. 8KiB pages double
+# B-tree fanout, so index and FTS segment lookups touch fewer interior pages.
+PAGE_SIZE = 8192
+# Prepared statements kept per connection (sqlite3 default: 128). search()
+# builds its SQL per filter combination, so there are many distinct texts.
+CACHED_STATEMENTS = 512
+# Prefix of stored listing hashes; bump it whenever compute_content_hash's
+# serialization changes, and keep the previous format readable in
+# content_hash_matches so an upgrade doesn't rewrite every directory.
+CONTENT_HASH_VERSION = "v2"
+
+
+# Every connection is opened with an explicit cache=private URI. Shared-cache
+# mode serializes all connections behind table-level locks and defeats WAL's
+# concurrent readers (measured about 3x slower under load), so it must never
+# be enabled here, even by a later "share one cache" refactor.
+CACHE_MODE = "private"
+
 
 class Database:
     """SQLite database manager with FTS5 search."""
 
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, read_pool_size: int = 4):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-
-    @contextmanager
-    def connect(self):
-        """Context manager for database connections."""
-        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        # Read-only connections, opened lazily and reused across calls.
+        # In WAL mode each one reads its own snapshot, so API queries run
+        # in parallel instead of serializing behind a single connection.
+        self.read_pool_size = read_pool_size
+        self._readers: queue.Queue[sqlite3.Connection] = queue.Queue()
+        self._readers_open = 0
+        self._readers_lock = threading.Lock()
+        # SQLite allows one writer at a time anyway, so keep a single
+        # long-lived write connection and serialize access with a lock.
+        self._writer: sqlite3.Connection | None = None
+        self._writer_lock = threading.Lock()
+
+    def _uri(self, **params: str) -> str:
+        """Build the connection URI; refuses anything but private cache."""
+        cache = params.setdefault("cache", CACHE_MODE)
+        if cache != CACHE_MODE:
+            raise ValueError(f"cache={cache} is not supported; connections "
+                             f"must use cache={CACHE_MODE} with WAL")
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return f"{self.db_path.resolve().as_uri()}?{query}"
+
+    def _open_writer(self) -> sqlite3.Connection:
+        # Autocommit mode: write() manages transactions itself.
+        conn = sqlite3.connect(self._uri(), uri=True, timeout=30,
+                               check_same_thread=False, isolation_level=None,
+                               cached_statements=CACHED_STATEMENTS)
         conn.row_factory = sqlite3.Row
+        # Must precede journal_mode=WAL, which writes the header of a new file
+        conn.execute(f"PRAGMA page_size={PAGE_SIZE}")
         conn.execute("PRAGMA journal_mode=WAL")
         conn.execute("PRAGMA synchronous=NORMAL")
-        conn.execute("PRAGMA cache_size=-64000")  # 64MB cache
+        conn.execute(f"PRAGMA cache_size=-{WRITER_CACHE_KIB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
         conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def write(self):
+        """Hold the shared write connection inside one write transaction.
+
+        BEGIN IMMEDIATE takes the write lock up front rather than
+        upgrading a deferred read lock on the first write, which is where
+        SQLITE_BUSY comes from while readers are active. Commits on
+        success, rolls back on error.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._open_writer()
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    # Older call sites (and ad-hoc scripts) use connect(); it is the writer.
+    connect = write
+
+    def close(self):
+        """Close the write connection and every idle pooled reader."""
+        with self._writer_lock:
+            if self._writer is not None:
+                # Planner statistics are refreshed here and in optimize()
+                # (after each sync), never per write transaction
+                self._writer.execute("PRAGMA optimize")
+                self._writer.close()
+                self._writer = None
+        self._close_idle_readers()
+
+    def _close_idle_readers(self):
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._readers_lock:
+                self._readers_open -= 1
+
+    def _open_reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._uri(mode="ro"), uri=True, timeout=30,
+                               check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA cache_size=-{READER_CACHE_KIB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        return conn
+
+    @contextmanager
+    def read(self):
+        """Borrow a pooled read-only connection (for SELECT-only methods)."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                can_open = self._readers_open < self.read_pool_size
+                if can_open:
+                    self._readers_open += 1
+            if can_open:
+                try:
+                    conn = self._open_reader()
+                except Exception:
+                    with self._readers_lock:
+                        self._readers_open -= 1
+                    raise
+            else:
+                conn = self._readers.get()
         try:
             yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
 
     def initialize(self):
         """Create tables and indexes."""
-        with self.connect() as conn:
-            conn.executescript(SCHEMA_SQL)
+        with self.write() as conn:
+            # Triggers missing from an existing entries table mean a
+            # bulk_load() was interrupted, leaving the FTS index behind.
+            interrupted_bulk_load = conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'entries') "
+                "AND (SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+                "AND name IN (?, ?, ?)) < 3",
+                FTS_TRIGGERS,
+            ).fetchone()[0]
+            if interrupted_bulk_load:
+                conn.execute("INSERT INTO entries_fts(entries_fts) VALUES('rebuild')")
+                logger.warning("FTS triggers were missing; rebuilt FTS index")
+            conn.executescript(SCHEMA_SQL + FTS_TRIGGERS_SQL)
             conn.execute(INIT_CRAWL_STATE)
+        self.migrate_set_fts_rank()
         logger.info("Database initialized at %s", self.db_path)
 
-    def insert_entries_batch(self, entries: list[dict]):
-        """Bulk insert/update entries. Uses INSERT OR REPLACE for upsert."""
+    def has_entries(self) -> bool:
+        """Whether anything has been indexed yet."""
+        with self.read() as conn:
+            return bool(conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM entries)"
+            ).fetchone()[0])
+
+    @contextmanager
+    def bulk_load(self):
+        """Suspend per-row FTS maintenance during a large import.
+
+        Drops the entries_ai/ad/au triggers so bulk upserts stop rewriting
+        the FTS index row by row, then recreates them and rebuilds the
+        index once on exit (also on error). Searches miss rows written
+        in the meantime, so this is meant for loading an empty index.
+        """
+        with self.write() as conn:
+            for name in FTS_TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        logger.info("Bulk load: FTS triggers dropped")
+        try:
+            yield
+        finally:
+            with self.write() as conn:
+                # Rebuild before restoring the triggers: if we die in
+                # between, initialize() sees them missing and rebuilds.
+                conn.execute("INSERT INTO entries_fts(entries_fts) VALUES('rebuild')")
+                conn.executescript(FTS_TRIGGERS_SQL)
+            logger.info("Bulk load: FTS triggers restored and index rebuilt")
+
+    def insert_entries_batch(self, entries: list[dict],
+                             conn: sqlite3.Connection | None = None):
+        """Bulk insert/update entries (upsert on path).
+
+        The whole batch runs in one explicit write transaction so a crawl
+        pays one commit (and WAL sync) per batch instead of per row. Pass
+        the connection from an open write() block to join that
+        transaction instead, so several batches share one commit.
+        """
         if not entries:
             return
-        sql = """
-            INSERT OR REPLACE INTO entries
-                (path, name, is_directory, file_size, last_modified,
-                 collection, platform, region, file_type, parent_path, updated_at)
-            VALUES
-                (:path, :name, :is_directory, :file_size, :last_modified,
-                 :collection, :platform, :region, :file_type, :parent_path,
-                 datetime('now'))
-        """
-        with self.connect() as conn:
-            conn.executemany(sql, entries)
+        if conn is not None:
+            self._insert_entries(conn, entries)
+            return
+        with self.write() as conn:
+            self._insert_entries(conn, entries)
+
+    @staticmethod
+    def _insert_entries(conn: sqlite3.Connection, entries: list[dict]):
+        # One timestamp for the whole batch (same format as datetime('now')),
+        # bound once instead of evaluated by SQLite for every row.
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        conn.executemany(INSERT_ENTRIES_SQL,
+                         ((*_entry_values(e), now) for e in entries))
 
     def upsert_sync_meta(self, path: str, etag: str | None,
                          last_modified: str | None, entry_count: int,
                          content_hash: str | None = None):
         """Update sync metadata for a directory."""
-        sql = """
-            INSERT OR REPLACE INTO sync_meta
-                (path, etag, last_modified, last_crawled, entry_count, content_hash)
-            VALUES (?, ?, ?, datetime('now'), ?, ?)
+        with self.write() as conn:
+            conn.execute(UPSERT_SYNC_META_SQL,
+                         (path, etag, last_modified, entry_count, content_hash))
+
+    @staticmethod
+    def _iter_dicts(conn: sqlite3.Connection, sql: str, params=()):
+        """Yield result rows as dicts while the cursor is read.
+
+        Rows come back as plain tuples zipped with the column names read
+        once, rather than a sqlite3.Row per result converted with dict(row)
+        after a fetchall(). Consume it before the connection is released.
         """
-        with self.connect() as conn:
-            conn.execute(sql, (path, etag, last_modified, entry_count, content_hash))
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(sql, params)
+        cols = [d[0] for d in cur.description]
+        for row in cur:
+            yield dict(zip(cols, row))
 
     def get_sync_meta(self, path: str) -> dict | None:
         """Get sync metadata for a directory."""
-        with self.connect() as conn:
+        with self.read() as conn:
             row = conn.execute(
                 "SELECT * FROM sync_meta WHERE path = ?", (path,)
             ).fetchone()
@@ -166,23 +492,65 @@ class Database:
     def compute_content_hash(entries: list[dict]) -> str:
         """Compute a SHA256 hash of directory listing content.
 
-        Takes the parsed entries (name, size, date) and produces a stable
-        hash. If the listing hasn't changed, the hash will be identical,
-        letting us skip expensive DB writes.
+        Takes the parsed entries (name, size, date, is_directory) and
+        produces a stable hash. If the listing hasn't changed, the hash
+        will be identical, letting us skip expensive DB writes. The result
+        carries a CONTENT_HASH_VERSION prefix so older stored hashes can
+        be told apart (see content_hash_matches).
         """
-        # Sort by name for stability (server order may vary)
+        # Entries sorted for stability (server order may vary) and streamed
+        # into the digest field by field. ASCII unit/record separators can't
+        # occur in listing text, so distinct listings can't serialize alike.
+        h = hashlib.sha256()
+        for name, size, date, is_dir in sorted(
+            (str(e.get("name", "")),
+             str(e.get("size") or ""),
+             str(e.get("date") or ""),
+             b"1" if e.get("is_directory") else b"0")
+            for e in entries
+        ):
+            h.update(name.encode("utf-8"))
+            h.update(b"\x1f")
+            h.update(size.encode("utf-8"))
+            h.update(b"\x1f")
+            h.update(date.encode("utf-8"))
+            h.update(b"\x1f")
+            h.update(is_dir)
+            h.update(b"\x1e")
+        return f"{CONTENT_HASH_VERSION}:{h.hexdigest()}"
+
+    @staticmethod
+    def _legacy_content_hash(entries: list[dict]) -> str:
+        """The unversioned hash stored before CONTENT_HASH_VERSION existed."""
         tuples = sorted(
             (e.get("name", ""), e.get("size") or "", e.get("date") or "")
             for e in entries
         )
-        raw = repr(tuples).encode("utf-8")
-        return hashlib.sha256(raw).hexdigest()
+        return hashlib.sha256(repr(tuples).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def content_hash_matches(stored: str | None, current: str,
+                             entries: list[dict]) -> bool:
+        """True if a stored listing hash says the listing is unchanged.
+
+        Hashes written before versioning are checked against the legacy
+        format, so upgrading does not make every directory look changed
+        (and rewrite the whole index on the first incremental sync). Such
+        a directory keeps its old hash until its listing really changes.
+        """
+        if not stored:
+            return False
+        if stored == current:
+            return True
+        if ":" not in stored:
+            return stored == Database._legacy_content_hash(entries)
+        return False
 
     # ── Schema migrations (idempotent) ────────────────────────────
 
     def migrate_add_content_hash(self):
         """Add content_hash column to sync_meta if it doesn't exist."""
-        with self.connect() as conn:
+        with self.write() as conn:
             try:
                 conn.execute("ALTER TABLE sync_meta ADD COLUMN content_hash TEXT")
                 logger.info("Migration: added content_hash column to sync_meta")
@@ -192,15 +560,120 @@ class Database:
                 else:
                     raise
 
+    def migrate_set_fts_rank(self):
+        """Store BM25_RANK as entries_fts's default rank function."""
+        with self.write() as conn:
+            row = conn.execute(
+                "SELECT v FROM entries_fts_config WHERE k = 'rank'"
+            ).fetchone()
+            if row is None or row[0] != BM25_RANK:
+                conn.execute(
+                    "INSERT INTO entries_fts(entries_fts, rank) VALUES('rank', ?)",
+                    (BM25_RANK,)
+                )
+                logger.info("Migration: set FTS rank function to %s", BM25_RANK)
+        # Read-only connections that already loaded the old FTS config fail
+        # their next rank query; drop idle ones so they reopen fresh
+        if row is None or row[0] != BM25_RANK:
+            self._close_idle_readers()
+
+    def migrate_populate_filter_stats(self):
+        """Fill the filter stats tables on databases indexed before they existed."""
+        with self.read() as conn:
+            needs_fill = conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM collection_stats) "
+                "AND EXISTS (SELECT 1 FROM entries WHERE is_directory = 0)"
+            ).fetchone()[0]
+        if needs_fill:
+            self.refresh_filter_stats()
+            logger.info("Migration: populated filter stats tables")
+
     def migrate_add_last_modified_index(self):
         """Add index on last_modified for date sorting."""
-        with self.connect() as conn:
+        with self.write() as conn:
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_entries_last_modified "
                 "ON entries(last_modified)"
             )
             logger.info("Migration: ensured idx_entries_last_modified index exists")
 
+    def has_unnormalized_dates(self) -> bool:
+        """Cheap pre-check for migrate_normalize_dates.
+
+        Uses the migration's own predicate, so it is answered from the
+        partial idx_entries_lm_unnorm index, which is near-empty once
+        the migration has run.
+        """
+        with self.read() as conn:
+            return bool(conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM entries "
+                "WHERE last_modified > '' AND last_modified NOT LIKE '%T%')"
+            ).fetchone()[0])
+
+    def has_dotslash_entries(self) -> bool:
+        """Cheap pre-check for cleanup_dotslash_duplicates."""
+        with self.read() as conn:
+            return bool(conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM entries "
+                "WHERE path LIKE '%/./%' OR path LIKE './%' OR name = '.') "
+                "OR EXISTS (SELECT 1 FROM sync_meta "
+                "WHERE path LIKE '%/./%' OR path LIKE './%')"
+            ).fetchone()[0])
+
+    # A file's parent directory is its path minus its name
+    _FILE_PARENT_SQL = "substr(path, 1, length(path) - length(name))"
+
+    def has_misparented_files(self) -> bool:
+        """Cheap pre-check for migrate_fix_file_parent_paths.
+
+        Older builds stored the grandparent directory as a file's
+        parent_path. The migration fixes every row in one transaction, so
+        the oldest file below the top level is enough to tell.
+        """
+        with self.read() as conn:
+            row = conn.execute(
+                "SELECT parent_path IS NOT " + self._FILE_PARENT_SQL + " FROM entries "
+                "WHERE is_directory = 0 AND path LIKE '%/%/%' ORDER BY id LIMIT 1"
+            ).fetchone()
+        return bool(row and row[0])
+
+    def migrate_fix_file_parent_paths(self) -> int:
+        """Point each file's parent_path at the directory that contains it.
+
+        parent_path is not indexed by FTS, so the FTS update trigger is
+        dropped for the duration instead of rewriting every file's row in
+        entries_fts.
+        """
+        with self.write() as conn:
+            conn.execute("DROP TRIGGER IF EXISTS entries_au")
+            fixed = conn.execute(
+                "UPDATE entries SET parent_path = " + self._FILE_PARENT_SQL + " "
+                "WHERE is_directory = 0 "
+                "AND substr(path, -length(name)) = name "
+                "AND parent_path IS NOT " + self._FILE_PARENT_SQL
+            ).rowcount
+            conn.execute(FTS_UPDATE_TRIGGER_SQL)
+        logger.info("Migration: fixed parent_path on %d files", fixed)
+        return fixed
+
+    def migrate_add_browse_index(self):
+        """Replace idx_entries_parent with the browse-ordered composite index."""
+        with self.write() as conn:
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_parent_listing "
+                "ON entries(parent_path, is_directory DESC, name)"
+            )
+            dropped = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' "
+                "AND name = 'idx_entries_parent'"
+            ).fetchone()
+            if dropped:
+                # Prefix of the new index, so it only costs writes now
+                conn.execute("DROP INDEX idx_entries_parent")
+                conn.execute("ANALYZE entries")
+                logger.info("Migration: replaced idx_entries_parent with "
+                            "idx_entries_parent_listing")
+
     # Date normalization patterns:
     #   "2024-01-15 10:30" → "2024-01-15T10:30:00"
     #   "18-Feb-2025 10:57" → "2025-02-18T10:57:00"
@@ -210,40 +683,60 @@ class Database:
     _DATE_FMT_DD_MON_YYYY = re.compile(
         r"^(\d{1,2})-([A-Za-z]{3})-(\d{4})\s+(\d{2}:\d{2})$"
     )
-
-    def migrate_normalize_dates(self):
+    # English month abbreviations as nginx writes them; a dict lookup is
+    # much cheaper than strptime, which stays as the fallback.
+    _MONTHS = {
+        "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04",
+        "May": "05", "Jun": "06", "Jul": "07", "Aug": "08",
+        "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12",
+    }
+
+    def migrate_normalize_dates(self, chunk_size: int = 10000):
         """Normalize existing last_modified values to ISO 8601 format.
 
         Converts:
           "2024-01-15 10:30"   →  "2024-01-15T10:30:00"
           "18-Feb-2025 10:57"  →  "2025-02-18T10:57:00"
         Already-normalized values (containing 'T') are skipped.
-        """
-        with self.connect() as conn:
-            rows = conn.execute(
-                "SELECT id, last_modified FROM entries "
-                "WHERE last_modified IS NOT NULL AND last_modified != '' "
-                "AND last_modified NOT LIKE '%T%'"
-            ).fetchall()
 
+        Walks candidates in id order, chunk_size rows at a time (found via
+        idx_entries_lm_unnorm), and commits each chunk separately so memory
+        and WAL growth stay bounded on large tables.
+        """
+        checked = normalized = 0
+        last_id = 0
+        while True:
+            with self.read() as conn:
+                rows = conn.execute(
+                    "SELECT id, last_modified FROM entries "
+                    "WHERE last_modified NOT LIKE '%T%' AND last_modified != '' "
+                    "AND id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size)
+                ).fetchall()
             if not rows:
-                logger.info("Migration: no dates to normalize")
-                return 0
+                break
+            last_id = rows[-1][0]
+            checked += len(rows)
 
             updates = []
-            for row in rows:
-                normalized = self._normalize_date_value(row["last_modified"])
-                if normalized and normalized != row["last_modified"]:
-                    updates.append((normalized, row["id"]))
-
+            for row_id, raw in rows:
+                value = self._normalize_date_value(raw)
+                if value and value != raw:
+                    updates.append((value, row_id))
             if updates:
-                conn.executemany(
-                    "UPDATE entries SET last_modified = ? WHERE id = ?",
-                    updates
-                )
+                with self.write() as conn:
+                    conn.executemany(
+                        "UPDATE entries SET last_modified = ? WHERE id = ?",
+                        updates
+                    )
+                normalized += len(updates)
+
+        if not checked:
+            logger.info("Migration: no dates to normalize")
+        else:
             logger.info("Migration: normalized %d dates out of %d checked",
-                        len(updates), len(rows))
-            return len(updates)
+                        normalized, checked)
+        return normalized
 
     @classmethod
     def _normalize_date_value(cls, raw: str) -> str | None:
@@ -265,6 +758,10 @@ class Database:
         # "18-Feb-2025 10:57" → "2025-02-18T10:57:00"
         m = cls._DATE_FMT_DD_MON_YYYY.match(raw)
         if m:
+            day, mon, year, hm = m.groups()
+            month = cls._MONTHS.get(mon.title())
+            if month:
+                return f"{year}-{month}-{int(day):02d}T{hm}:00"
             try:
                 dt = datetime.strptime(raw, "%d-%b-%Y %H:%M")
                 return dt.strftime("%Y-%m-%dT%H:%M:00")
@@ -274,6 +771,12 @@ class Database:
         # Unknown format — return as-is
         return raw
 
+    # Query sanitizing for search(). Special chars (+, &, |, etc.) become
+    # spaces so "ratcher+tool" becomes "ratcher tool"; FTS5 operators are
+    # removed because they could cause syntax errors.
+    _FTS_SPECIAL_RE = re.compile(r'[+&|/\\~^{}()\[\]<>:;!@#$%]')
+    _FTS_OP_RE = re.compile(r'\b(AND|OR|NOT|NEAR)\b', re.IGNORECASE)
+
     def search(self, query: str, collection: str | None = None,
                platform: str | None = None, file_type: str | None = None,
                region: str | None = None,
@@ -288,12 +791,8 @@ class Database:
         or treated as word separators.
         """
         # Build FTS query — sanitize, tokenize, prefix-match each term
-        import re
-        # Replace special chars (+, &, |, -, etc.) with spaces so
-        # "ratcher+tool" becomes "ratcher tool"
-        cleaned = re.sub(r'[+&|/\\~^{}()\[\]<>:;!@#$%]', ' ', query)
-        # Remove FTS5 operators that could cause syntax errors
-        cleaned = re.sub(r'\b(AND|OR|NOT|NEAR)\b', '', cleaned, flags=re.IGNORECASE)
+        cleaned = self._FTS_SPECIAL_RE.sub(' ', query)
+        cleaned = self._FTS_OP_RE.sub('', cleaned)
 
         fts_terms = []
         for token in cleaned.strip().split():
@@ -309,7 +808,10 @@ class Database:
 
         fts_query = " AND ".join(fts_terms)
 
-        # Build WHERE conditions
+        # Build WHERE conditions. MATCH must target the table name, not a
+        # column (entries_fts.name MATCH ...): only the table form is handed
+        # to FTS5 as an index constraint; a column MATCH degrades to a full
+        # scan of the virtual table.
         conditions = ["entries_fts MATCH :query"]
         params: dict = {"query": fts_query}
 
@@ -343,19 +845,10 @@ class Database:
         params["limit"] = per_page
         params["offset"] = offset
 
-        with self.connect() as conn:
-            # Count total matches
-            count_sql = f"""
-                SELECT COUNT(*) as total
-                FROM entries_fts
-                JOIN entries e ON entries_fts.rowid = e.id
-                WHERE {where}
-            """
-            total = conn.execute(count_sql, params).fetchone()["total"]
-
+        with self.read() as conn:
             # Determine sort order
             SORT_MAP = {
-                "relevance": "bm25(entries_fts, 10.0, 1.0, 5.0, 5.0, 2.0)",
+                "relevance": "rank",
                 "name": "e.name COLLATE NOCASE",
                 "size": "e.file_size",
                 "type": "e.file_type",
@@ -370,40 +863,107 @@ class Database:
             else:
                 direction = "DESC" if sort_order == "desc" else "ASC"
 
-            # Fetch page of results
+            # Fetch page of results. The match set has to be fully sorted
+            # for ORDER BY ... LIMIT anyway, so the window count rides along
+            # instead of running the FTS query a second time for COUNT(*).
+            # CROSS JOIN pins entries_fts as the outer loop: with the window
+            # the planner otherwise walks every filtered entries row and
+            # probes the FTS index once per row.
+            # The CTE sorts only ids, rank and the sort key; full rows are
+            # read for the page alone rather than for every match.
             results_sql = f"""
-                SELECT e.*, bm25(entries_fts, 10.0, 1.0, 5.0, 5.0, 2.0) as rank
-                FROM entries_fts
-                JOIN entries e ON entries_fts.rowid = e.id
-                WHERE {where}
+                WITH page AS (
+                    SELECT e.id, entries_fts.rank as rank, COUNT(*) OVER () as _total
+                    FROM entries_fts
+                    CROSS JOIN entries e ON entries_fts.rowid = e.id
+                    WHERE {where}
+                    ORDER BY {order_col} {direction}
+                    LIMIT :limit OFFSET :offset
+                )
+                SELECT e.*, page.rank as rank, page._total as _total
+                FROM page
+                CROSS JOIN entries e ON e.id = page.id
                 ORDER BY {order_col} {direction}
-                LIMIT :limit OFFSET :offset
             """
-            rows = conn.execute(results_sql, params).fetchall()
+            results = list(self._iter_dicts(conn, results_sql, params))
+            if results:
+                total = results[0]["_total"]
+                for r in results:
+                    del r["_total"]
+            elif offset:
+                # Past the last page: no row to carry the count
+                count_sql = f"""
+                    SELECT COUNT(*) as total
+                    FROM entries_fts
+                    CROSS JOIN entries e ON entries_fts.rowid = e.id
+                    WHERE {where}
+                """
+                total = conn.execute(count_sql, params).fetchone()["total"]
+            else:
+                total = 0
 
             return {
                 "total": total,
                 "page": page,
                 "per_page": per_page,
                 "pages": (total + per_page - 1) // per_page,
-                "results": [dict(r) for r in rows],
+                "results": results,
             }
 
+    def refresh_filter_stats(self):
+        """Recount collection_stats / platform_stats from entries.
+
+        The entries_stats_* triggers keep both tables current, so this is
+        only needed to fill them on databases indexed before the tables
+        existed, or to repair them.
+        """
+        with self.write() as conn:
+            conn.execute("DELETE FROM collection_stats")
+            conn.execute("""
+                INSERT INTO collection_stats (collection, count)
+                SELECT collection, COUNT(*)
+                FROM entries
+                WHERE is_directory = 0 AND collection IS NOT NULL
+                GROUP BY collection
+            """)
+            conn.execute("DELETE FROM platform_stats")
+            conn.execute("""
+                INSERT INTO platform_stats (platform, collection, count)
+                SELECT platform, collection, COUNT(*)
+                FROM entries
+                WHERE is_directory = 0 AND platform IS NOT NULL
+                GROUP BY platform, collection
+            """)
+        logger.info("Filter stats refreshed")
+
+    def optimize(self, merge_fts: bool = True):
+        """Index maintenance, run after syncs and on startup.
+
+        Merges the FTS5 index segments written during a crawl (optional —
+        costly on a large index), lets SQLite refresh planner statistics
+        where they are stale, and truncates the WAL.
+        """
+        with self.write() as conn:
+            if merge_fts:
+                conn.execute("INSERT INTO entries_fts(entries_fts) VALUES('optimize')")
+            conn.commit()  # checkpoint cannot run inside a transaction
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info("Database optimized (merge_fts=%s)", merge_fts)
+
     def get_collections(self) -> list[dict]:
         """Get all collections with file counts."""
         sql = """
-            SELECT collection, COUNT(*) as count
-            FROM entries
-            WHERE is_directory = 0 AND collection IS NOT NULL
-            GROUP BY collection
+            SELECT collection, count
+            FROM collection_stats
             ORDER BY count DESC
         """
-        with self.connect() as conn:
-            return [dict(r) for r in conn.execute(sql).fetchall()]
+        with self.read() as conn:
+            return list(self._iter_dicts(conn, sql))
 
     def get_platforms(self, collection: str | None = None) -> list[dict]:
         """Get all platforms, optionally filtered by collection."""
-        conditions = ["is_directory = 0", "platform IS NOT NULL"]
+        conditions = []
         params = []
         if collection:
             # Support multi-value
@@ -415,16 +975,15 @@ class Database:
                 placeholders = ",".join("?" * len(colls))
                 conditions.append(f"collection IN ({placeholders})")
                 params.extend(colls)
-        where = " AND ".join(conditions)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
         sql = f"""
-            SELECT platform, collection, COUNT(*) as count
-            FROM entries
-            WHERE {where}
-            GROUP BY platform, collection
+            SELECT platform, collection, count
+            FROM platform_stats
+            {where}
             ORDER BY count DESC
         """
-        with self.connect() as conn:
-            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+        with self.read() as conn:
+            return list(self._iter_dicts(conn, sql, params))
 
     def get_manufacturers(self) -> list[dict]:
         """Get distinct manufacturers extracted from platform names.
@@ -434,46 +993,40 @@ class Database:
         data with their platforms for the two-tier filter UI.
         """
         sql = """
-            SELECT platform, COUNT(*) as count
-            FROM entries
-            WHERE is_directory = 0 AND platform IS NOT NULL
+            SELECT platform, SUM(count) as count
+            FROM platform_stats
             GROUP BY platform
             ORDER BY count DESC
         """
-        with self.connect() as conn:
+        with self.read() as conn:
             rows = conn.execute(sql).fetchall()
 
-        # Group by manufacturer
-        mfr_map: dict[str, list[dict]] = {}
-        for row in rows:
-            plat = row["platform"]
-            count = row["count"]
-            if " - " in plat:
-                manufacturer = plat.split(" - ", 1)[0].strip()
-            else:
-                manufacturer = "Other"
-            if manufacturer not in mfr_map:
-                mfr_map[manufacturer] = []
-            mfr_map[manufacturer].append({"platform": plat, "count": count})
+        # Group by manufacturer, accumulating [total, platforms] per bucket.
+        # Rows arrive ordered by count DESC, so each platform list is
+        # already sorted.
+        mfr_map: dict[str, list] = {}
+        for plat, count in rows:
+            head, sep, _ = plat.partition(" - ")
+            manufacturer = head.strip() if sep else "Other"
+            bucket = mfr_map.setdefault(manufacturer, [0, []])
+            bucket[0] += count
+            bucket[1].append({"platform": plat, "count": count})
 
         # Sort manufacturers by total file count
-        result = []
-        for mfr, platforms in sorted(
-            mfr_map.items(),
-            key=lambda x: sum(p["count"] for p in x[1]),
-            reverse=True,
-        ):
-            total = sum(p["count"] for p in platforms)
-            result.append({
-                "manufacturer": mfr,
-                "total_count": total,
-                "platforms": sorted(platforms, key=lambda p: p["count"], reverse=True),
-            })
-        return result
+        return [
+            {"manufacturer": mfr, "total_count": total, "platforms": platforms}
+            for mfr, (total, platforms) in sorted(
+                mfr_map.items(), key=lambda item: item[1][0], reverse=True
+            )
+        ]
 
     def get_stats(self) -> dict:
         """Get database statistics."""
-        with self.connect() as conn:
+        return {**self.get_index_counts(), **self.get_sync_summary()}
+
+    def get_index_counts(self) -> dict:
+        """Entry, collection and platform counts (the index-derived stats)."""
+        with self.read() as conn:
             total_files = conn.execute(
                 "SELECT COUNT(*) as c FROM entries WHERE is_directory = 0"
             ).fetchone()["c"]
@@ -486,20 +1039,74 @@ class Database:
             platforms = conn.execute(
                 "SELECT COUNT(DISTINCT platform) as c FROM entries"
             ).fetchone()["c"]
-            crawl = conn.execute("SELECT * FROM crawl_state WHERE id = 1").fetchone()
-            # Get the most recent sync completion time
-            last_synced = None
-            if crawl:
-                last_synced = dict(crawl).get("finished_at")
             return {
                 "total_files": total_files,
                 "total_dirs": total_dirs,
                 "collections": collections,
                 "platforms": platforms,
-                "last_synced": last_synced,
-                "crawl_status": dict(crawl) if crawl else None,
             }
 
+    def get_sync_summary(self) -> dict:
+        """Live crawl state and the most recent sync completion time."""
+        crawl = self.get_crawl_state()
+        return {
+            "last_synced": crawl.get("finished_at") if crawl else None,
+            "crawl_status": crawl,
+        }
+
+    _RECENT_COLUMNS = (
+        "id, path, name, is_directory, file_size, last_modified, "
+        "collection, platform, region, file_type, parent_path"
+    )
+
+    def get_recently_added(self, cutoff: str, page: int = 1, per_page: int = 50,
+                           after: tuple[str, int] | None = None) -> dict:
+        """Files with last_modified >= cutoff, newest first.
+
+        With after=(last_modified, id) of the previous page's last row, the
+        page is fetched by keyset instead of OFFSET and the COUNT is skipped
+        (total/pages are None).
+        """
+        with self.read() as conn:
+            if after is None:
+                total = conn.execute(
+                    "SELECT COUNT(*) as c FROM entries "
+                    "WHERE is_directory = 0 AND last_modified >= ?",
+                    (cutoff,)
+                ).fetchone()["c"]
+                pages = (total + per_page - 1) // per_page
+                sql = (
+                    f"SELECT {self._RECENT_COLUMNS} FROM entries "
+                    "WHERE is_directory = 0 AND last_modified >= ? "
+                    "ORDER BY last_modified DESC, id DESC "
+                    "LIMIT ? OFFSET ?"
+                )
+                params = (cutoff, per_page, (page - 1) * per_page)
+            else:
+                total = pages = None
+                sql = (
+                    f"SELECT {self._RECENT_COLUMNS} FROM entries "
+                    "WHERE is_directory = 0 AND last_modified >= ? "
+                    "AND (last_modified, id) < (?, ?) "
+                    "ORDER BY last_modified DESC, id DESC "
+                    "LIMIT ?"
+                )
+                params = (cutoff, after[0], after[1], per_page)
+
+            results = list(self._iter_dicts(conn, sql, params))
+
+        next_cursor = None
+        if len(results) == per_page:
+            next_cursor = f"{results[-1]['last_modified']}|{results[-1]['id']}"
+        return {
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": pages,
+            "next_cursor": next_cursor,
+            "results": results,
+        }
+
     def browse(self, parent_path: str) -> list[dict]:
         """Browse entries in a specific directory."""
         sql = """
@@ -507,35 +1114,133 @@ class Database:
             WHERE parent_path = ?
             ORDER BY is_directory DESC, name ASC
         """
-        with self.connect() as conn:
-            return [dict(r) for r in conn.execute(sql, (parent_path,)).fetchall()]
+        with self.read() as conn:
+            return list(self._iter_dicts(conn, sql, (parent_path,)))
+
+    def get_subdirectories(self, parent_path: str) -> list[str]:
+        """Paths of the indexed subdirectories directly under parent_path."""
+        with self.read() as conn:
+            return [r["path"] for r in conn.execute(
+                "SELECT path FROM entries WHERE parent_path = ? AND is_directory = 1",
+                (parent_path,)
+            )]
 
     def update_crawl_state(self, **kwargs):
         """Update crawl state."""
         sets = ", ".join(f"{k} = :{k}" for k in kwargs)
         sql = f"UPDATE crawl_state SET {sets} WHERE id = 1"
-        with self.connect() as conn:
+        with self.write() as conn:
             conn.execute(sql, kwargs)
 
     def get_crawl_state(self) -> dict | None:
-        with self.connect() as conn:
+        with self.read() as conn:
             row = conn.execute("SELECT * FROM crawl_state WHERE id = 1").fetchone()
             return dict(row) if row else None
 
     def remove_missing_entries(self, parent_path: str, current_names: set[str]):
         """Remove entries under parent_path that are no longer present."""
-        with self.connect() as conn:
-            existing = conn.execute(
-                "SELECT id, name FROM entries WHERE parent_path = ?",
-                (parent_path,)
-            ).fetchall()
-            to_delete = [r["id"] for r in existing if r["name"] not in current_names]
-            if to_delete:
-                placeholders = ",".join("?" * len(to_delete))
-                conn.execute(
-                    f"DELETE FROM entries WHERE id IN ({placeholders})", to_delete
-                )
-                logger.info("Removed %d stale entries from %s", len(to_delete), parent_path)
+        with self.write() as conn:
+            self._delete_missing(conn, parent_path, current_names)
+
+    @staticmethod
+    def _delete_missing(conn: sqlite3.Connection, parent_path: str,
+                        current_names: set[str]) -> int:
+        """Delete entries under parent_path whose name is not in current_names.
+
+        The names go through a temp table rather than a NOT IN (?, ?, ...)
+        list: no bound-parameter limit, and SQLite plans the anti-join
+        against the temp table's primary key.
+        """
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _tmp_names (name TEXT PRIMARY KEY)"
+        )
+        conn.execute("DELETE FROM _tmp_names")
+        conn.executemany(
+            "INSERT OR IGNORE INTO _tmp_names (name) VALUES (?)",
+            ((n,) for n in current_names)
+        )
+        removed = conn.execute(
+            "DELETE FROM entries WHERE parent_path = ? "
+            "AND name NOT IN (SELECT name FROM _tmp_names)",
+            (parent_path,)
+        ).rowcount
+        # The write connection is long-lived, so don't leave the names behind
+        conn.execute("DELETE FROM _tmp_names")
+        if removed:
+            logger.info("Removed %d stale entries from %s", removed, parent_path)
+        return removed
+
+    def commit_directory(self, parent_path: str, entries: list[dict],
+                         current_names: set[str] | None,
+                         etag: str | None, last_modified: str | None,
+                         entry_count: int, content_hash: str | None):
+        """Write everything the crawler learned about one directory at once.
+
+        Upserts the listing's entries, drops entries no longer listed (when
+        current_names is given, see _delete_missing) and records sync_meta — all in a single
+        IMMEDIATE transaction, so each crawled directory costs one commit.
+        """
+        with self.write() as conn:
+            self._write_directory(conn, parent_path, entries, current_names,
+                                  etag, last_modified, entry_count, content_hash)
+
+    def commit_directories(self, directories: list[tuple]):
+        """Write many directories in one transaction.
+
+        Each item holds commit_directory's arguments in order.
+        """
+        if not directories:
+            return
+        with self.write() as conn:
+            for args in directories:
+                self._write_directory(conn, *args)
+
+    @contextmanager
+    def batch_writer(self, commit_every: int = 10000):
+        """Group many commit_directory() calls into fewer transactions.
+
+        Yields an add() with commit_directory's signature. Directories are
+        buffered and written together once about commit_every rows are
+        pending, and whatever is left is written on exit. Each directory's
+        entries and sync_meta still land in the same transaction, so an
+        interrupted crawl never records a directory as synced without its
+        entries. The write lock is only held while flushing.
+        """
+        pending: list[tuple] = []
+        rows = 0
+
+        def flush():
+            nonlocal rows
+            self.commit_directories(pending)
+            pending.clear()
+            rows = 0
+
+        def add(parent_path: str, entries: list[dict],
+                current_names: set[str] | None,
+                etag: str | None, last_modified: str | None,
+                entry_count: int, content_hash: str | None):
+            nonlocal rows
+            pending.append((parent_path, entries, current_names,
+                            etag, last_modified, entry_count, content_hash))
+            rows += len(entries) + 1
+            if rows >= commit_every:
+                flush()
+
+        try:
+            yield add
+        finally:
+            flush()
+
+    def _write_directory(self, conn: sqlite3.Connection, parent_path: str,
+                         entries: list[dict], current_names: set[str] | None,
+                         etag: str | None, last_modified: str | None,
+                         entry_count: int, content_hash: str | None):
+        if entries:
+            self._insert_entries(conn, entries)
+        if current_names is not None:
+            self._delete_missing(conn, parent_path, current_names)
+        conn.execute(UPSERT_SYNC_META_SQL,
+                     (parent_path, etag, last_modified, entry_count, content_hash))
 
     def cleanup_dotslash_duplicates(self) -> dict:
         """Remove entries with './' in their paths (duplicate artifacts from crawling '.' dirs).
@@ -549,43 +1254,43 @@ class Database:
 
         Returns dict with counts of what was cleaned.
         """
-        with self.connect() as conn:
+        with self.write() as conn:
             # Count before
             total_before = conn.execute("SELECT COUNT(*) as c FROM entries").fetchone()["c"]
 
+            # Each DELETE reports its own rowcount, so no separate COUNT
+            # scan per category. Row counts are taken in this order, so an
+            # entry matching several patterns is counted once.
+
             # 1. Delete entries with /./ in path (mid-path dot-slash duplicates)
             dotslash_mid = conn.execute(
-                "SELECT COUNT(*) as c FROM entries WHERE path LIKE '%/./%'"
-            ).fetchone()["c"]
+                "DELETE FROM entries WHERE path LIKE '%/./%'"
+            ).rowcount
             if dotslash_mid > 0:
-                conn.execute("DELETE FROM entries WHERE path LIKE '%/./%'")
                 logger.info("Deleted %d entries with '/./' in path", dotslash_mid)
 
             # 2. Delete entries where path starts with './' (leading dot-slash)
             dotslash_lead = conn.execute(
-                "SELECT COUNT(*) as c FROM entries WHERE path LIKE './%'"
-            ).fetchone()["c"]
+                "DELETE FROM entries WHERE path LIKE './%'"
+            ).rowcount
             if dotslash_lead > 0:
-                conn.execute("DELETE FROM entries WHERE path LIKE './%'")
                 logger.info("Deleted %d entries with leading './' in path", dotslash_lead)
 
             # 3. Delete entries named exactly '.'
             dot_entries = conn.execute(
-                "SELECT COUNT(*) as c FROM entries WHERE name = '.'"
-            ).fetchone()["c"]
+                "DELETE FROM entries WHERE name = '.'"
+            ).rowcount
             if dot_entries > 0:
-                conn.execute("DELETE FROM entries WHERE name = '.'")
                 logger.info("Deleted %d entries named '.'", dot_entries)
 
             # 4. Clean up sync_meta with './' paths
             dot_sync = conn.execute(
-                "SELECT COUNT(*) as c FROM sync_meta WHERE path LIKE '%/./%' OR path LIKE './%'"
-            ).fetchone()["c"]
+                "DELETE FROM sync_meta WHERE path LIKE '%/./%' OR path LIKE './%'"
+            ).rowcount
             if dot_sync > 0:
-                conn.execute("DELETE FROM sync_meta WHERE path LIKE '%/./%' OR path LIKE './%'")
                 logger.info("Deleted %d sync_meta entries with '.' paths", dot_sync)
 
-            total_after = conn.execute("SELECT COUNT(*) as c FROM entries").fetchone()["c"]
+            total_after = total_before - dotslash_mid - dotslash_lead - dot_entries
 
             # 5. Rebuild FTS index to remove stale entries
             try:
@@ -596,6 +1301,7 @@ class Database:
 
             # 6. Update query planner statistics and checkpoint WAL
             try:
+                conn.commit()  # checkpoint cannot run inside a transaction
                 conn.execute("ANALYZE")
                 conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
             except Exception as e:
@@ -605,12 +1311,12 @@ class Database:
             logger.info("Cleanup complete: removed %d entries (%d → %d)",
                         removed, total_before, total_after)
 
-            return {
-                "dotslash_mid_removed": dotslash_mid,
-                "dotslash_lead_removed": dotslash_lead,
-                "dot_entries_removed": dot_entries,
-                "sync_meta_removed": dot_sync,
-                "total_before": total_before,
-                "total_after": total_after,
-                "total_removed": removed,
-            }
+        return {
+            "dotslash_mid_removed": dotslash_mid,
+            "dotslash_lead_removed": dotslash_lead,
+            "dot_entries_removed": dot_entries,
+            "sync_meta_removed": dot_sync,
+            "total_before": total_before,
+            "total_after": total_after,
+            "total_removed": removed,
+        }
@@ -0,0 +1,15 @@
+"""Process-wide Database instance shared by the API and the sync jobs.
+
+Importing `db` from here (rather than constructing Database(DB_PATH) per
+module) keeps one reader pool, one set of connection PRAGMAs and one page
+cache per process.
+"""
+from config import DB_PATH
+from indexer.database import Database
+
+db = Database(DB_PATH)
+
+
+def get_db() -> Database:
+    """Return the shared Database (usable as a FastAPI dependency)."""
+    return db
@@ -1,34 +1,44 @@
 """Parse Myrient HTTP directory listings and extract metadata from paths."""
 import re
-import json
 import logging
+from collections import deque
+from html import unescape
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import unquote
 
+import orjson
+
+try:
+    # Lexbor is selectolax's newer, faster backend
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # selectolax builds without lexbor
+    from selectolax.parser import HTMLParser
+
 logger = logging.getLogger(__name__)
 
-# Load categories from bundled JSON
 _CATEGORIES_PATH = Path(__file__).parent.parent / "data" / "categories.json"
-_CATEGORIES: dict | None = None
-_FLAT_CATEGORIES: list[tuple[str, str]] | None = None  # (platform_string, manufacturer)
 
 
-def _load_categories() -> tuple[dict, list[tuple[str, str]]]:
-    """Load and flatten categories for matching."""
-    global _CATEGORIES, _FLAT_CATEGORIES
-    if _CATEGORIES is not None:
-        return _CATEGORIES, _FLAT_CATEGORIES
+def _unquote(text: str) -> str:
+    """unquote() that skips the scan and copy when there is nothing to decode."""
+    return unquote(text) if "%" in text else text
 
+
+def _read_categories() -> dict:
+    """Load the bundled categories.json."""
     try:
-        with open(_CATEGORIES_PATH) as f:
-            _CATEGORIES = json.load(f)
+        return orjson.loads(_CATEGORIES_PATH.read_bytes())
     except FileNotFoundError:
         logger.warning("categories.json not found at %s, using empty categories", _CATEGORIES_PATH)
-        _CATEGORIES = {"Categories": {}, "Types": [], "Regions": [], "Special": {}}
+        return {"Categories": {}, "Types": [], "Regions": [], "Special": {}}
+
 
+def _flatten_categories(categories: dict) -> list[tuple[str, str]]:
+    """Flatten categories into (platform_string, manufacturer) pairs for matching."""
     # Build flat list sorted by string length (longest first for greedy matching)
     flat = []
-    for manufacturer, platforms in _CATEGORIES.get("Categories", {}).items():
+    for manufacturer, platforms in categories.get("Categories", {}).items():
         # Add manufacturer itself as a matchable string
         flat.append((manufacturer, manufacturer))
         for platform in platforms:
@@ -39,8 +49,60 @@ def _load_categories() -> tuple[dict, list[tuple[str, str]]]:
             flat.append((platform, manufacturer))
 
     # Sort by length descending — longest match wins
-    _FLAT_CATEGORIES = sorted(flat, key=lambda x: len(x[0]), reverse=True)
-    return _CATEGORIES, _FLAT_CATEGORIES
+    return sorted(flat, key=lambda x: len(x[0]), reverse=True)
+
+
+def _build_automaton(patterns: list[str]) -> tuple[list[dict], list[int], list[int | None]]:
+    """Build an Aho–Corasick automaton over patterns.
+
+    Each state's output is the lowest pattern index that ends there
+    (including via failure links), so with patterns sorted longest-first
+    a scan picks the same winner as the old in-order substring loop.
+    """
+    goto: list[dict] = [{}]
+    fail: list[int] = [0]
+    out: list[int | None] = [None]
+
+    for index, pattern in enumerate(patterns):
+        state = 0
+        for ch in pattern:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                goto.append({})
+                fail.append(0)
+                out.append(None)
+                nxt = len(goto) - 1
+                goto[state][ch] = nxt
+            state = nxt
+        if out[state] is None:
+            out[state] = index
+
+    # Breadth-first so each failure target is complete before its children
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, child in goto[state].items():
+            queue.append(child)
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            target = goto[f].get(ch, 0)
+            fail[child] = target if target != child else 0
+            inherited = out[fail[child]]
+            if inherited is not None and (out[child] is None or inherited < out[child]):
+                out[child] = inherited
+
+    return goto, fail, out
+
+
+# Loaded once at import; extract_platform reads these directly
+_CATEGORIES: dict = _read_categories()
+_FLAT_CATEGORIES: list[tuple[str, str]] = _flatten_categories(_CATEGORIES)
+# Aho–Corasick automaton over the lowercased platform strings: (goto, fail, out).
+# goto is a character trie of those strings; the failure links let one pass
+# over the whole path find matches in any component, which matters because
+# the platform is not always the second one (e.g. TOSEC/Commodore/Amiga/...).
+_PLATFORM_AUTOMATON = _build_automaton([p.lower() for p, _ in _FLAT_CATEGORIES])
 
 
 def parse_directory_listing(html: str) -> list[dict]:
@@ -55,24 +117,125 @@ def parse_directory_listing(html: str) -> list[dict]:
 
     Returns list of dicts with keys: name, href, size, date, is_directory
     """
-    from selectolax.parser import HTMLParser
+    if not html or html.isspace():
+        return []
+
+    # Fastest path: Myrient's own markup, matched without building a DOM
+    entries = _parse_table_markup(html)
+    if entries is not None:
+        return entries
 
     tree = HTMLParser(html)
     entries = []
 
-    # Find all table rows — Myrient uses <table id="list"> or just <pre> with links
-    rows = tree.css("table#list tr")
-    if rows:
-        entries = _parse_table_rows(rows)
-    else:
-        # Fallback: some pages use <pre> with <a> tags (simpler listing)
-        pre = tree.css_first("pre")
-        if pre:
-            entries = _parse_pre_listing(pre)
+    # Myrient uses <table id="list"> or just <pre> with links
+    table = tree.css_first(_TABLE_SELECTOR)
+    if table is not None:
+        # Fast path: pull each column out in one query and zip them
+        columns = _table_columns(table)
+        if columns is not None:
+            return _parse_table_columns(*columns)
+        rows = table.css("tr")
+        if rows:
+            return _parse_table_rows(rows)
+
+    # Fallback: some pages use <pre> with <a> tags (simpler listing)
+    pre = tree.css_first("pre")
+    if pre:
+        entries = _parse_pre_listing(pre)
 
     return entries
 
 
+# Parent/current directory links. Myrient uses "Parent directory"
+# (lowercase 'd') and has "." links.
+_SKIP_NAMES = frozenset({"../", "..", ".", "./", "Parent Directory", "Parent directory"})
+_SKIP_HREFS = frozenset({"../", "..", "/", "./", "."})
+
+_TABLE_SELECTOR = "table#list"
+
+# One table#list row exactly as Myrient's nginx fancyindex writes it
+_ROW_RE = re.compile(
+    r'<td class="link"><a href="([^"]*)"[^>]*>([^<]*)</a></td>\s*'
+    r'<td class="size">([^<]*)</td>\s*'
+    r'<td class="date">([^<]*)</td>'
+)
+
+
+def _is_navigation_link(name: str, href: str) -> bool:
+    """True for parent/current directory links that are not real entries."""
+    return name in _SKIP_NAMES or href in _SKIP_HREFS or name[:10].lower() == "parent dir"
+
+
+def _table_columns(table) -> tuple[list, list, list] | None:
+    """Return the (links, sizes, dates) columns of table#list, or None.
+
+    Only usable when every link cell has exactly one anchor, size and
+    date, so the columns line up row for row; anything else (missing
+    cells, class-less tables) goes through the per-row parser instead.
+    Queries are scoped to the table node rather than the whole document.
+    """
+    cells = table.css("td.link")
+    if not cells:
+        return None
+    links = []
+    for cell in cells:
+        anchors = cell.css("a")
+        if len(anchors) != 1:
+            return None
+        links.append(anchors[0])
+    sizes = table.css("td.size")
+    dates = table.css("td.date")
+    if not len(cells) == len(sizes) == len(dates):
+        return None
+    # Equal totals can still hide a row that is one cell short next to
+    # one with an extra, so each size and date must share its link's row
+    for cell, size_td, date_td in zip(cells, sizes, dates):
+        row = cell.parent.mem_id
+        if size_td.parent.mem_id != row or date_td.parent.mem_id != row:
+            return None
+    return links, sizes, dates
+
+
+def _unescape(text: str) -> str:
+    """html.unescape() that skips text without entities."""
+    return unescape(text) if "&" in text else text
+
+
+def _parse_table_markup(html: str) -> list[dict] | None:
+    """Parse table#list rows with one regex pass, or None to use the DOM.
+
+    Only trusted when every link cell on the page matched _ROW_RE, so any
+    markup it does not know (extra tags, other attribute layouts) falls
+    back to the selectolax parsers.
+    """
+    cells = html.count('<td class="link"')
+    if not cells or 'id="list"' not in html:
+        return None
+    rows = _ROW_RE.findall(html)
+    if len(rows) != cells:
+        return None
+
+    entries = []
+    for href, name, size_text, date_text in rows:
+        entry = _table_entry(_unescape(href), _unescape(name).strip(),
+                             _unescape(size_text).strip(), _unescape(date_text).strip())
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def _parse_table_columns(links, sizes, dates) -> list[dict]:
+    """Parse aligned link/size/date columns from a table#list."""
+    entries = []
+    for link, size_td, date_td in zip(links, sizes, dates):
+        entry = _table_entry(link.attributes.get("href", ""), link.text(strip=True),
+                             size_td.text(strip=True), date_td.text(strip=True))
+        if entry:
+            entries.append(entry)
+    return entries
+
+
 def _parse_table_rows(rows) -> list[dict]:
     """Parse <tr> rows from a table#list."""
     entries = []
@@ -81,37 +244,41 @@ def _parse_table_rows(rows) -> list[dict]:
         if not link:
             continue
 
-        href = link.attributes.get("href", "")
-        name = link.text(strip=True)
-
-        # Skip parent directory and current directory entries
-        # Myrient uses "Parent directory" (lowercase 'd') and has "." links
-        if name in ("../", "..", ".", "./", "Parent Directory") or \
-           name.lower().startswith("parent dir") or \
-           href in ("../", "/", "./", "."):
-            continue
-
         size_td = row.css_first("td.size, td:nth-child(2)")
         date_td = row.css_first("td.date, td:nth-child(3)")
 
         size_text = size_td.text(strip=True) if size_td else ""
         date_text = date_td.text(strip=True) if date_td else ""
 
-        is_directory = href.endswith("/") or size_text in ("-", "")
+        entry = _table_entry(link.attributes.get("href", ""), link.text(strip=True),
+                             size_text, date_text)
+        if entry:
+            entries.append(entry)
 
-        decoded_name = unquote(name.rstrip("/"))
-        if decoded_name in (".", ".."):
-            continue
+    return entries
 
-        entries.append({
-            "name": decoded_name,
-            "href": href,
-            "size": size_text if size_text not in ("-", "") else None,
-            "date": date_text if date_text else None,
-            "is_directory": is_directory,
-        })
 
-    return entries
+def _table_entry(href: str, name: str, size_text: str, date_text: str) -> dict | None:
+    """Build one listing entry from a table row's cells, or None to skip it."""
+    # Skip parent directory and current directory entries
+    if _is_navigation_link(name, href):
+        return None
+
+    # Myrient shows "-" (or nothing) as the size of a directory
+    no_size = not size_text or size_text == "-"
+    is_directory = no_size or href.endswith("/")
+
+    decoded_name = _unquote(name.rstrip("/"))
+    if decoded_name in (".", ".."):
+        return None
+
+    return {
+        "name": decoded_name,
+        "href": href,
+        "size": None if no_size else size_text,
+        "date": date_text if date_text else None,
+        "is_directory": is_directory,
+    }
 
 
 def _parse_pre_listing(pre_node) -> list[dict]:
@@ -121,12 +288,10 @@ def _parse_pre_listing(pre_node) -> list[dict]:
         href = link.attributes.get("href", "")
         name = link.text(strip=True)
 
-        if name in ("../", "..", ".", "./", "Parent Directory") or \
-           name.lower().startswith("parent dir") or \
-           href in ("../", "/", "./", "."):
+        if _is_navigation_link(name, href):
             continue
 
-        decoded_name = unquote(name.rstrip("/"))
+        decoded_name = _unquote(name.rstrip("/"))
         if decoded_name in (".", ".."):
             continue
 
@@ -153,20 +318,50 @@ def extract_collection(path: str) -> str | None:
     return parts[0] if parts else None
 
 
+def _scan_platforms(text: str, state: int = 0, best: int | None = None) -> tuple[int, int | None]:
+    """Feed lowercased text through the platform automaton.
+
+    Returns the end state and the best (lowest) pattern index seen, so a
+    scan can be resumed where a previous one stopped.
+    """
+    goto, fail, out = _PLATFORM_AUTOMATON
+    for ch in text:
+        while state and ch not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(ch, 0)
+        index = out[state]
+        if index is not None and (best is None or index < best):
+            best = index
+    return state, best
+
+
+@lru_cache(maxsize=4096)
+def _platform_for_dir(dir_path: str) -> tuple[int, int | None]:
+    """Automaton scan of a directory prefix, shared by every file inside it."""
+    return _scan_platforms(dir_path.lower())
+
+
 def extract_platform(path: str) -> str | None:
     """Extract the platform/console from a path using categories.json.
 
-    Uses longest-match strategy to avoid false positives.
-    """
-    _, flat_cats = _load_categories()
-    decoded = unquote(path)
+    Uses longest-match strategy to avoid false positives: one
+    Aho–Corasick pass over the path finds every platform string it
+    contains, and the longest one wins. The scan of the directory part
+    is cached, so each file only pays for its own name.
 
-    for platform_str, _manufacturer in flat_cats:
-        if platform_str.lower() in decoded.lower():
-            return platform_str
+    path must already be percent-decoded, as build_entry's is (listing
+    names are decoded by the parsers). Decoding again would corrupt
+    names that contain a literal '%'.
+    """
+    dir_path, sep, name = path.rpartition("/")
+    state, best = _platform_for_dir(dir_path + sep)
+    if name:
+        state, best = _scan_platforms(name.lower(), state, best)
+    if best is not None:
+        return _FLAT_CATEGORIES[best][0]
 
     # Fallback: use second path component if available
-    parts = decoded.strip("/").split("/")
+    parts = path.strip("/").split("/")
     if len(parts) >= 2:
         return parts[1]
 
@@ -179,7 +374,8 @@ _KNOWN_REGIONS = [
     'Sweden', 'Norway', 'Denmark', 'Finland', 'Portugal', 'Russia',
     'China', 'Taiwan', 'Hong Kong', 'Canada',
 ]
-_REGION_RE = '(?:' + '|'.join(_KNOWN_REGIONS) + ')'
+# Longest first so the alternation prefers e.g. "Hong Kong" over a shorter prefix
+_REGION_RE = '(?:' + '|'.join(sorted(_KNOWN_REGIONS, key=len, reverse=True)) + ')'
 _REGION_PATTERN = re.compile(
     r'\((' + _REGION_RE + r'(?:\s*,\s*' + _REGION_RE + r')*)\)',
     re.IGNORECASE
@@ -188,6 +384,8 @@ _REGION_PATTERN = re.compile(
 
 def extract_region(name: str) -> str | None:
     """Extract region from filename. e.g. 'Game (USA, Europe).zip' → 'USA, Europe'"""
+    if "(" not in name:
+        return None
     match = _REGION_PATTERN.search(name)
     return match.group(1) if match else None
 
@@ -199,6 +397,21 @@ def extract_file_type(name: str) -> str | None:
     return None
 
 
+# Both Myrient date formats (see normalize_myrient_date) in one pattern, so
+# each date costs a single match. Used with .match(), which already anchors
+# at the start.
+_DATE_RE = re.compile(
+    r"(?:(?P<ymd>\d{4}-\d{2}-\d{2})"
+    r"|(?P<day>\d{1,2})-(?P<mon>[A-Za-z]{3})-(?P<year>\d{4}))"
+    r"\s+(?P<hm>\d{2}:\d{2})$"
+)
+_MONTHS = {
+    "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04",
+    "May": "05", "Jun": "06", "Jul": "07", "Aug": "08",
+    "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12",
+}
+
+
 def normalize_myrient_date(raw: str | None) -> str | None:
     """Normalize Myrient date formats to ISO 8601.
 
@@ -209,29 +422,27 @@ def normalize_myrient_date(raw: str | None) -> str | None:
     Returns ISO 8601 format: "2024-01-15T10:30:00"
     Returns None for empty/None input.
     """
-    if not raw or not raw.strip():
+    if not raw:
         return None
 
     raw = raw.strip()
+    if not raw:
+        return None
 
     # Already ISO 8601?
     if "T" in raw:
         return raw
 
-    # Format 1: "2024-01-15 10:30" → "2024-01-15T10:30:00"
-    m = re.match(r"^(\d{4}-\d{2}-\d{2})\s+(\d{2}:\d{2})$", raw)
-    if m:
-        return f"{m.group(1)}T{m.group(2)}:00"
-
-    # Format 2: "18-Feb-2025 10:57" → "2025-02-18T10:57:00"
-    m = re.match(r"^(\d{1,2})-([A-Za-z]{3})-(\d{4})\s+(\d{2}:\d{2})$", raw)
+    m = _DATE_RE.match(raw)
     if m:
-        try:
-            from datetime import datetime
-            dt = datetime.strptime(raw, "%d-%b-%Y %H:%M")
-            return dt.strftime("%Y-%m-%dT%H:%M:00")
-        except ValueError:
-            pass
+        ymd, day, mon, year, hm = m.groups()
+        # Format 1: "2024-01-15 10:30" → "2024-01-15T10:30:00"
+        if ymd:
+            return f"{ymd}T{hm}:00"
+        # Format 2: "18-Feb-2025 10:57" → "2025-02-18T10:57:00"
+        month = _MONTHS.get(mon.title())
+        if month:
+            return f"{year}-{month}-{int(day):02d}T{hm}:00"
 
     # Unknown format — return as-is
     return raw
@@ -242,7 +453,10 @@ def _normalize_path(path: str) -> str:
 
     e.g. 'No-Intro/./Sony/./game.zip' → 'No-Intro/Sony/game.zip'
     """
-    import posixpath
+    # Already clean (the common case): no leading '/', empty or '.' segments
+    if not (path.startswith("/") or "//" in path or "./" in path or path.endswith(".")):
+        return path
+
     # Split, filter out empty and '.' segments, rejoin
     parts = path.split("/")
     cleaned = [p for p in parts if p and p != "."]
@@ -266,6 +480,18 @@ def build_entry(href: str, name: str, is_directory: bool,
     # Clean up leading slash and normalize away "./" segments
     full_path = _normalize_path(full_path.lstrip("/"))
 
+    # Everything up to and including the last '/' before the name;
+    # full_path is already normalized
+    stripped = full_path.rstrip("/")
+    parent_path = stripped[:stripped.rfind("/") + 1]
+
+    # Region and file type describe files only
+    if is_directory:
+        region = file_type = None
+    else:
+        region = extract_region(name)
+        file_type = extract_file_type(name)
+
     return {
         "path": full_path,
         "name": name,
@@ -273,8 +499,8 @@ def build_entry(href: str, name: str, is_directory: bool,
         "file_size": size,
         "last_modified": normalize_myrient_date(date),
         "collection": extract_collection(full_path),
-        "platform": extract_platform(full_path) if not is_directory or full_path.count("/") <= 2 else extract_platform(full_path),
-        "region": extract_region(name) if not is_directory else None,
-        "file_type": extract_file_type(name) if not is_directory else None,
-        "parent_path": _normalize_path(full_path.rsplit("/", 2)[0] + "/") if "/" in full_path.rstrip("/") else "",
+        "platform": extract_platform(full_path),
+        "region": region,
+        "file_type": file_type,
+        "parent_path": parent_path,
     }
@@ -1,20 +1,29 @@
 """Smart incremental sync for keeping the index up-to-date."""
 import asyncio
+import contextlib
 import logging
+from typing import Callable
 
+from config import CRAWL_CONCURRENCY
 from indexer.database import Database
 from indexer.crawler import MyrientCrawler
 
 logger = logging.getLogger(__name__)
 
 
-async def run_sync(db: Database, full: bool = False):
+async def run_sync(db: Database, full: bool = False,
+                   on_change: Callable[[], None] | None = None,
+                   concurrency: int = CRAWL_CONCURRENCY):
     """Run a sync operation.
 
     Args:
         db: Database instance
         full: If True, ignore cached ETags and re-crawl everything.
               If False, use incremental sync (skip unchanged directories).
+        on_change: Called when the sync starts and again when it ends,
+                   successfully or not (e.g. to drop caches; a failed
+                   crawl may still have committed part of its writes).
+        concurrency: Number of directories fetched in parallel.
     """
     state = db.get_crawl_state()
     if state and state.get("status") == "crawling":
@@ -22,10 +31,17 @@ async def run_sync(db: Database, full: bool = False):
         return
 
     logger.info("Starting %s sync", "full" if full else "incremental")
-    crawler = MyrientCrawler(db, incremental=not full)
+    crawler = MyrientCrawler(db, incremental=not full, concurrency=concurrency)
 
+    # The first crawl into an empty index has no search results to lose,
+    # so let it skip per-row FTS updates and build the index once at the end.
+    loader = db.bulk_load() if not db.has_entries() else contextlib.nullcontext()
+
+    if on_change:
+        on_change()
     try:
-        await crawler.crawl()
+        with loader:
+            await crawler.crawl()
     except Exception as e:
         logger.error("Sync failed: %s", e)
         db.update_crawl_state(
@@ -33,8 +49,16 @@ async def run_sync(db: Database, full: bool = False):
             message=f"Sync failed: {e}"
         )
         raise
+    finally:
+        if on_change:
+            on_change()
+
+    db.optimize()
 
 
-def run_sync_blocking(db: Database, full: bool = False):
+def run_sync_blocking(db: Database, full: bool = False,
+                      on_change: Callable[[], None] | None = None,
+                      concurrency: int = CRAWL_CONCURRENCY):
     """Blocking wrapper for run_sync (used by scheduler)."""
-    asyncio.run(run_sync(db, full=full))
+    asyncio.run(run_sync(db, full=full, on_change=on_change,
+                         concurrency=concurrency))
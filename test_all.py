@@ -56,6 +56,10 @@ pdir_entries = parse_directory_listing(PARENT_DIR_HTML)
 check("parent dir (lowercase): filtered out", len(pdir_entries) == 1)
 check("parent dir: only file remains", pdir_entries[0]["name"] == "Zelda (USA).zip")
 
+# Bare ".." href with a non-standard label is navigation too
+UP_HREF_HTML = PARENT_DIR_HTML.replace('<a href="../">Parent directory</a>', '<a href="..">Up</a>')
+check("parent dir: '..' href filtered", len(parse_directory_listing(UP_HREF_HTML)) == 1)
+
 # File listing with parent dir
 FILE_HTML = """<html><body>
 <table id="list">
@@ -73,6 +77,43 @@ check("files: correct name", entries[0]["name"] == "Legend of Zelda, The (USA).z
 check("files: size parsed", entries[0]["size"] == "512.0 KB")
 check("files: not directory", entries[0]["is_directory"] is False)
 
+# A row missing its date cell must not shift the other rows' columns
+RAGGED_HTML = """<table id="list">
+<tr><td class="link"><a href="a.zip">a.zip</a></td><td class="size">1 KB</td></tr>
+<tr><td class="link"><a href="b.zip">b.zip</a></td><td class="size">2 KB</td><td class="date">2024-01-01 10:00</td></tr>
+</table>"""
+ragged = parse_directory_listing(RAGGED_HTML)
+check("ragged rows: a.zip has no date", ragged[0]["date"] is None)
+check("ragged rows: b.zip keeps its date", ragged[1]["date"] == "2024-01-01 10:00")
+
+# Anchor counts that only balance in total (one cell with none, one with
+# two) must not zip a.zip with the anchor-less row's size and date
+ANCHORS_HTML = """<table id="list">
+<tr><td class="link"></td><td class="size">1 KB</td><td class="date">2024-01-01 10:00</td></tr>
+<tr><td class="link"><a href="a.zip">a.zip</a><a href="b.zip">b.zip</a></td><td class="size">2 KB</td><td class="date">2024-02-02 10:00</td></tr>
+</table>"""
+anchors = parse_directory_listing(ANCHORS_HTML)
+check("uneven anchors: a.zip keeps its own size",
+      anchors[0]["name"] == "a.zip" and anchors[0]["size"] == "2 KB")
+check("uneven anchors: a.zip keeps its own date", anchors[0]["date"] == "2024-02-02 10:00")
+
+# Same for size cells: one row short, the next with an extra
+SIZES_HTML = """<table id="list">
+<tr><td class="link"><a href="a.zip">a.zip</a></td><td class="date">2024-01-01 10:00</td></tr>
+<tr><td class="link"><a href="b.zip">b.zip</a></td><td class="size">2 KB</td><td class="size">9 KB</td><td class="date">2024-02-02 10:00</td></tr>
+</table>"""
+uneven = parse_directory_listing(SIZES_HTML)
+check("uneven sizes: b.zip keeps its first size", uneven[1]["size"] == "2 KB")
+
+# Markup the regex fast path does not know is parsed via the DOM instead
+NESTED_HTML = """<table id="list">
+<tr><td class="link"><a href="x%20y.zip"><span>x &amp; y.zip</span></a></td><td class="size">1 KB</td><td class="date">2024-01-01 10:00</td></tr>
+<tr><td class="link"><a href="z.zip">z.zip</a></td><td class="size">2 KB</td><td class="date">2024-01-01 10:00</td></tr>
+</table>"""
+nested = parse_directory_listing(NESTED_HTML)
+check("unknown markup: DOM fallback keeps every row",
+      [e["name"] for e in nested] == ["x & y.zip", "z.zip"])
+
 # ═══════════════════════════════════════════════════════════════
 print("\n── 2. Metadata Extraction Tests ──")
 
@@ -95,6 +136,19 @@ check(f"platform: GBA → '{p}'", p is not None and "Game Boy Advance" in p)
 p = extract_platform("Redump/Sony - PlayStation 2/game.zip")
 check(f"platform: PS2 → '{p}'", p is not None and "PlayStation 2" in p)
 
+p = extract_platform("redump/sony - playstation 2/game.zip")
+check(f"platform: case-insensitive → '{p}'", p == "Sony - PlayStation 2")
+
+p = extract_platform("Qqq/Zzz Qqq/game.zap")
+check(f"platform: fallback to 2nd component → '{p}'", p == "Zzz Qqq")
+
+from indexer.parser import _platform_for_dir
+_hits = _platform_for_dir.cache_info().hits
+p1 = extract_platform("No-Intro/Nintendo - Game Boy Advance/a.zip")
+p2 = extract_platform("No-Intro/Nintendo - Game Boy Advance/b.zip")
+check("platform: directory scan cached across files",
+      p1 == p2 and _platform_for_dir.cache_info().hits >= _hits + 2)
+
 # ═══════════════════════════════════════════════════════════════
 print("\n── 3. build_entry Tests ──")
 
@@ -127,6 +181,11 @@ if shm.exists():
 db = Database(DB_PATH)
 db.initialize()
 check("db: initialized", db_file.exists())
+try:
+    db._uri(cache="shared")
+    check("db: shared cache refused", False)
+except ValueError:
+    check("db: shared cache refused", True)
 
 stats = db.get_stats()
 check("db: empty stats", stats["total_files"] == 0)
@@ -197,6 +256,15 @@ check("collections: has Redump", "Redump" in coll_names)
 platforms = db.get_platforms()
 check(f"platforms: {len(platforms)} found", len(platforms) >= 4)
 
+manufacturers = db.get_manufacturers()
+mfr_totals = [m["total_count"] for m in manufacturers]
+check(f"manufacturers: {[m['manufacturer'] for m in manufacturers]}",
+      {"Nintendo", "Sega", "Sony"} <= {m["manufacturer"] for m in manufacturers})
+check("manufacturers: sorted by total, totals add up",
+      mfr_totals == sorted(mfr_totals, reverse=True)
+      and all(m["total_count"] == sum(p["count"] for p in m["platforms"])
+              for m in manufacturers))
+
 # ═══════════════════════════════════════════════════════════════
 print("\n── 6. Search Tests ──")
 
@@ -228,12 +296,70 @@ check(f'filtered "Final Fantasy" in Redump: {results["total"]}', results["total"
 results = db.search("USA", page=1, per_page=3)
 check(f'pagination: page 1 has {len(results["results"])} results (max 3)',
       len(results["results"]) <= 3 and results["total"] > 3)
+past_end = db.search("USA", page=1000, per_page=3)
+check(f'pagination: past last page keeps total ({past_end["total"]})',
+      past_end["results"] == [] and past_end["total"] == results["total"])
+check("pagination: window count column not leaked", "_total" not in results["results"][0])
+
+# Query plan: the FTS5 MATCH must be resolved through the full-text index
+import re
+from contextlib import contextmanager
+
+traced_sql = []
+_orig_read = db.read
+
+
+@contextmanager
+def _traced_read():
+    with _orig_read() as conn:
+        conn.set_trace_callback(traced_sql.append)
+        try:
+            yield conn
+        finally:
+            conn.set_trace_callback(None)
+
+
+db.read = _traced_read
+db.search("Zelda", collection="No-Intro")
+db.read = _orig_read
+
+match_sql = [s for s in traced_sql if "MATCH" in s]
+with db.connect() as conn:
+    plan = " | ".join(
+        r["detail"] for s in match_sql
+        for r in conn.execute("EXPLAIN QUERY PLAN " + s).fetchall()
+    )
+check(f"query plan: FTS index used → {plan}",
+      bool(match_sql) and re.search(r"VIRTUAL TABLE INDEX \d+:\w*M", plan) is not None)
+
+# Recently added: keyset cursor walks the same rows as OFFSET paging
+recent = db.get_recently_added("2000-01-01T00:00:00", page=1, per_page=5)
+check(f"recent: total={recent['total']} files", recent["total"] == file_count)
+walked = [r["path"] for r in recent["results"]]
+cursor = recent["next_cursor"]
+while cursor:
+    lm, _, eid = cursor.rpartition("|")
+    nxt = db.get_recently_added("2000-01-01T00:00:00", per_page=5, after=(lm, int(eid)))
+    check("recent: cursor page skips COUNT", nxt["total"] is None)
+    walked += [r["path"] for r in nxt["results"]]
+    cursor = nxt["next_cursor"]
+check(f"recent: cursor walk covers all {len(walked)} files once",
+      len(walked) == file_count and len(set(walked)) == file_count)
 
 # ═══════════════════════════════════════════════════════════════
 print("\n── 7. Browse Tests ──")
 
 browse = db.browse("No-Intro/")
 check(f"browse No-Intro/: {len(browse)} entries", len(browse) >= 3)
+check("browse: directories first, then by name",
+      [(not e["is_directory"], e["name"]) for e in browse]
+      == sorted((not e["is_directory"], e["name"]) for e in browse))
+with db.read() as conn:
+    browse_plan = " | ".join(r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM entries WHERE parent_path = ? "
+        "ORDER BY is_directory DESC, name ASC", ("No-Intro/",)))
+check(f"browse: no sort step → {browse_plan}",
+      "idx_entries_parent_listing" in browse_plan and "TEMP B-TREE" not in browse_plan)
 
 # ═══════════════════════════════════════════════════════════════
 print("\n── 8. Sort Tests ──")
@@ -252,6 +378,15 @@ check("sort name desc: reverse alphabetical", names_desc == sorted(names_desc, k
 # Sort by relevance (default)
 results_rel = db.search("Zelda", sort_by="relevance", page=1, per_page=10)
 check("sort relevance: results returned", results_rel["total"] >= 2)
+with db.read() as conn:
+    weighted = {
+        r[0]: r[1] for r in conn.execute(
+            "SELECT rowid, bm25(entries_fts, 10.0, 1.0, 5.0, 5.0, 2.0) "
+            "FROM entries_fts WHERE entries_fts MATCH '\"Zelda\"*'"
+        )
+    }
+check("sort relevance: rank is the weighted bm25",
+      all(abs(r["rank"] - weighted[r["id"]]) < 1e-9 for r in results_rel["results"]))
 
 # Sort by type
 results_type = db.search("USA", sort_by="type", sort_order="asc", page=1, per_page=50)
@@ -272,6 +407,8 @@ check("normalize: dir/ preserved",
       _normalize_path("./dir/") == "dir/")
 check("normalize: clean path unchanged",
       _normalize_path("No-Intro/Sony/game.zip") == "No-Intro/Sony/game.zip")
+check("normalize: trailing '/.' and '//' collapsed",
+      _normalize_path("/a//b/.") == "a/b")
 
 # Insert entries with leading './' and verify cleanup removes them
 dotslash_entries = [
@@ -285,8 +422,10 @@ dotslash_entries[0]["path"] = "./No-Intro/Nintendo - NES/game1.zip"
 dotslash_entries[1]["path"] = "No-Intro/./Nintendo - NES/game2.zip"
 db.insert_entries_batch(dotslash_entries)
 
+check("cleanup: pre-check sees './' entries", db.has_dotslash_entries())
 stats_before = db.get_stats()
 cleanup = db.cleanup_dotslash_duplicates()
+check("cleanup: pre-check clear after cleanup", not db.has_dotslash_entries())
 stats_after = db.get_stats()
 
 check(f"cleanup: removed leading './' entries ({cleanup['dotslash_lead_removed']})",
@@ -370,8 +509,18 @@ hash_c = Database.compute_content_hash(entries_c)
 
 check("hash: same entries (different order) → same hash", hash_a == hash_b)
 check("hash: different entries → different hash", hash_a != hash_c)
-check("hash: is hex string", len(hash_a) == 64 and all(c in "0123456789abcdef" for c in hash_a))
-check("hash: empty list", len(Database.compute_content_hash([])) == 64)
+hash_version, _, hash_hex = hash_a.partition(":")
+check("hash: versioned hex string", hash_version == "v2" and len(hash_hex) == 64
+      and all(c in "0123456789abcdef" for c in hash_hex))
+check("hash: empty list", len(Database.compute_content_hash([]).partition(":")[2]) == 64)
+# Hashes stored before versioning still recognise an unchanged listing
+legacy_a = Database._legacy_content_hash(entries_a)
+check("hash: legacy hash of same listing matches",
+      Database.content_hash_matches(legacy_a, hash_b, entries_b))
+check("hash: legacy hash of other listing differs",
+      not Database.content_hash_matches(legacy_a, hash_c, entries_c))
+check("hash: no stored hash never matches",
+      not Database.content_hash_matches(None, hash_a, entries_a))
 
 # ═══════════════════════════════════════════════════════════════
 print("\n── 13. Schema Migration Tests ──")
@@ -395,6 +544,95 @@ db.upsert_sync_meta("test/path/", None, None, 6, "newhash456")
 meta2 = db.get_sync_meta("test/path/")
 check("sync_meta: content_hash updated", meta2["content_hash"] == "newhash456")
 
+batch_entries = [build_entry("batched.zip", "batched.zip", False, "1 KB",
+                             "2024-01-01", "Batch/Dir/")]
+with db.batch_writer() as add_directory:
+    add_directory("Batch/Dir/", batch_entries, None, None, None, 1, "batchhash")
+    check("batch_writer: buffered until flush", db.get_sync_meta("Batch/Dir/") is None)
+check("batch_writer: flushed on exit",
+      (db.get_sync_meta("Batch/Dir/") or {}).get("content_hash") == "batchhash"
+      and len(db.search("batched")["results"]) == 1)
+
+db.commit_directories([
+    ("Multi/A/", [build_entry("multia.zip", "multia.zip", False, "1 KB", "2024-01-01", "Multi/A/")],
+     None, None, None, 1, "hash-a"),
+    ("Multi/B/", [build_entry("multib.zip", "multib.zip", False, "1 KB", "2024-01-01", "Multi/B/")],
+     None, None, None, 1, "hash-b"),
+])
+check("commit_directories: every directory written",
+      (db.get_sync_meta("Multi/B/") or {}).get("content_hash") == "hash-b"
+      and db.search("multia")["total"] == 1)
+
+with db.bulk_load():
+    db.insert_entries_batch([build_entry("bulkloaded.zip", "bulkloaded.zip", False,
+                                         "1 KB", "2024-01-01", "Batch/Dir/")])
+    check("bulk_load: FTS not updated per row", db.search("bulkloaded")["total"] == 0)
+check("bulk_load: FTS rebuilt on exit", db.search("bulkloaded")["total"] == 1)
+with db.read() as conn:
+    trigger_count = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+        "AND name IN ('entries_ai', 'entries_ad', 'entries_au')"
+    ).fetchone()[0]
+check("bulk_load: triggers restored", trigger_count == 3)
+
+def _entry_id(path):
+    with db.read() as conn:
+        return conn.execute("SELECT id FROM entries WHERE path = ?", (path,)).fetchone()[0]
+
+upsert_entry = build_entry("bulkloaded.zip", "bulkloaded.zip", False,
+                           "2 KB", "2024-02-01", "Batch/Dir/")
+id_before = _entry_id(upsert_entry["path"])
+db.insert_entries_batch([upsert_entry])
+check("upsert: re-insert keeps row id", _entry_id(upsert_entry["path"]) == id_before)
+check("upsert: FTS still finds updated row", db.search("bulkloaded")["total"] == 1)
+
+# conn= joins the caller's transaction: both batches roll back together
+try:
+    with db.write() as conn:
+        db.insert_entries_batch([build_entry("joined1.zip", "joined1.zip", False, "1 KB",
+                                             "2024-01-01", "Joined/")], conn=conn)
+        db.insert_entries_batch([build_entry("joined2.zip", "joined2.zip", False, "1 KB",
+                                             "2024-01-01", "Joined/")], conn=conn)
+        raise RuntimeError("abort")
+except RuntimeError:
+    pass
+check("insert_entries_batch(conn=): shares the caller's transaction",
+      db.search("joined1")["total"] == 0 and db.search("joined2")["total"] == 0)
+
+# Large directory: more names than SQLite's default bound-parameter limit
+big_entries = [build_entry(f"big{i:04d}.zip", f"big{i:04d}.zip", False, "1 KB",
+                           "2024-01-01", "Big/Dir/") for i in range(1500)]
+db.insert_entries_batch(big_entries)
+db.remove_missing_entries("Big/Dir/", {e["name"] for e in big_entries[:1200]})
+with db.read() as conn:
+    big_left = conn.execute(
+        "SELECT COUNT(*) FROM entries WHERE parent_path = 'Big/Dir/'"
+    ).fetchone()[0]
+check(f"remove_missing: 1200 of 1500 kept ({big_left})", big_left == 1200)
+with db.write() as conn:
+    conn.execute("DELETE FROM entries WHERE parent_path = 'Big/Dir/'")
+
+# Files used to get their grandparent as parent_path; the migration repoints them
+check("build_entry: file parent_path is its directory",
+      big_entries[0]["parent_path"] == "Big/Dir/")
+check("browse: lists files of a nested directory",
+      any(e["name"] == "bulkloaded.zip" for e in db.browse("Batch/Dir/")))
+check("parent pre-check: clean index", not db.has_misparented_files())
+with db.write() as conn:
+    old_parents = [(path.rsplit("/", 2)[0] + "/", row_id) for row_id, path in conn.execute(
+        "SELECT id, path FROM entries WHERE is_directory = 0 AND path LIKE '%/%/%'")]
+    conn.executemany("UPDATE entries SET parent_path = ? WHERE id = ?", old_parents)
+check("parent pre-check: flags grandparent parent_path", db.has_misparented_files())
+fixed = db.migrate_fix_file_parent_paths()
+check(f"parent migration: fixed {fixed} files",
+      fixed == len(old_parents) and not db.has_misparented_files())
+with db.read() as conn:
+    au_left = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = 'entries_au'"
+    ).fetchone()[0]
+check("parent migration: FTS update trigger restored", au_left == 1)
+check("parent migration: FTS still finds file", db.search("bulkloaded")["total"] == 1)
+
 # ═══════════════════════════════════════════════════════════════
 print("\n── 14. Date Migration Tests ──")
 
@@ -411,6 +649,7 @@ old_date_entries[1]["last_modified"] = "18-Feb-2025 10:57"
 db.insert_entries_batch(old_date_entries)
 
 # Run migration
+check("date migration: pre-check sees old dates", db.has_unnormalized_dates())
 normalized_count = db.migrate_normalize_dates()
 check(f"date migration: normalized {normalized_count} dates", normalized_count >= 2)
 
@@ -432,6 +671,60 @@ check("date migration: DD-Mon-YYYY → ISO",
 normalized_again = db.migrate_normalize_dates()
 check("date migration: idempotent (0 on re-run)", normalized_again == 0)
 
+# Trigger-maintained filter counts must match a full recount after all the
+# inserts, upserts and deletes above
+with db.read() as conn:
+    live_stats = (
+        sorted(map(tuple, conn.execute("SELECT * FROM collection_stats"))),
+        sorted(map(tuple, conn.execute("SELECT * FROM platform_stats")), key=str),
+    )
+db.refresh_filter_stats()
+with db.read() as conn:
+    recounted = (
+        sorted(map(tuple, conn.execute("SELECT * FROM collection_stats"))),
+        sorted(map(tuple, conn.execute("SELECT * FROM platform_stats")), key=str),
+    )
+check("filter stats: triggers match full recount", live_stats == recounted)
+
+# ═══════════════════════════════════════════════════════════════
+print("\n── 15. Crawler Write Failure Tests ──")
+
+import asyncio
+import time
+import indexer.crawler as crawler_mod
+from indexer.crawler import MyrientCrawler
+
+
+class _TwoDirCrawler(MyrientCrawler):
+    """Skips HTTP: "crawls" two directories, then the workers finish."""
+
+    async def _run_workers(self, timeout, connector):
+        await connector.close()
+        for name in ("a/", "b/"):
+            await self._commit_directory(name, [], None, None, None, 0, None)
+
+
+def _late_disk_full(batch):
+    # Fails only after the workers are done and the last batch is queued
+    time.sleep(0.2)
+    raise RuntimeError("disk full")
+
+
+saved = (crawler_mod.WRITE_BATCH_ROWS, crawler_mod.WRITE_QUEUE_BATCHES)
+crawler_mod.WRITE_BATCH_ROWS, crawler_mod.WRITE_QUEUE_BATCHES = 1, 1
+db.commit_directories = _late_disk_full
+try:
+    asyncio.run(asyncio.wait_for(_TwoDirCrawler(db).crawl(), 5))
+    crawl_outcome = "returned"
+except asyncio.TimeoutError:
+    crawl_outcome = "hung"
+except RuntimeError as e:
+    crawl_outcome = str(e)
+finally:
+    del db.commit_directories
+    crawler_mod.WRITE_BATCH_ROWS, crawler_mod.WRITE_QUEUE_BATCHES = saved
+check("crawl: late write failure raises instead of hanging", crawl_outcome == "disk full")
+
 # ═══════════════════════════════════════════════════════════════
 print(f"\n{'='*50}")
 print(f"Results: {passed} passed, {failed} failed out of {passed+failed} tests")
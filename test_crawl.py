@@ -4,105 +4,117 @@ import sys
 import os
 import logging
 
-# Ensure we can import from project root
-sys.path.insert(0, os.path.dirname(__file__))
+logger = logging.getLogger(__name__)
 
-# Override config for testing
-os.environ["DATA_DIR"] = os.path.join(os.path.dirname(__file__), "data")
+# Bounds that keep this a quick test against the live site
+MAX_DEPTH = 2       # levels below the root to visit
+MAX_SUBDIRS = 2     # subdirectories followed per listing
+MAX_ENTRIES = 50    # entries kept per listing
+WORKERS = 4         # concurrent fetches
 
-from config import DB_PATH, MYRIENT_BASE_URL
-from indexer.database import Database
-from indexer.parser import parse_directory_listing, build_entry, extract_platform, extract_region
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
-logger = logging.getLogger(__name__)
+async def fetch(session, url: str) -> tuple[int, str, str | None]:
+    """GET a listing page; returns (status, body, Content-Encoding)."""
+    async with session.get(url) as resp:
+        body = await resp.read()
+        return (resp.status, body.decode(resp.charset or "utf-8", "replace"),
+                resp.headers.get("Content-Encoding"))
 
 
 async def test_fetch_and_parse():
-    """Fetch the root directory and a couple of subdirectories."""
+    """Crawl the top of the tree breadth-first with a small worker pool.
+
+    Listings go through an asyncio.Queue of (path, depth); each worker
+    fetches and parses one, keeps its first MAX_ENTRIES entries and queues
+    the first MAX_SUBDIRS subdirectories until MAX_DEPTH. Everything is
+    inserted at the end with a single batch insert.
+
+    The project imports live here so importing this module has no side
+    effects; DATA_DIR must be set before the first call (config reads it
+    on import).
+    """
     import aiohttp
 
+    from config import DB_PATH, MYRIENT_BASE_URL
+    from indexer.database import Database
+    from indexer.parser import parse_directory_listing, build_entry, _platform_for_dir
+
     db = Database(DB_PATH)
     db.initialize()
     logger.info("Database initialized at %s", DB_PATH)
 
+    all_entries = []  # every listing's entries, inserted once after the crawl
+
+    async def crawl_listing(session, path: str, depth: int, queue: asyncio.Queue):
+        url = f"{MYRIENT_BASE_URL}{path}"
+        logger.info("Fetching: %s", url)
+        status, html, encoding = await fetch(session, url)
+        if status != 200:
+            logger.warning("HTTP %d for %s", status, url)
+            return
+        if depth == 0:
+            logger.info("Root page: HTTP %d, %d bytes (Content-Encoding: %s)",
+                        status, len(html), encoding or "identity")
+
+        # Parse in a thread, as the crawler does, so the other workers'
+        # fetches keep going while a large page is parsed
+        entries = await asyncio.to_thread(parse_directory_listing, html)
+        logger.info("Listing '%s' has %d entries", path or "/", len(entries))
+
+        # Build entries and note subdirectories in the same pass
+        db_entries = []
+        subdirs = []
+        for e in entries[:MAX_ENTRIES]:
+            db_entries.append(build_entry(e["href"], e["name"], e["is_directory"],
+                                          e["size"], e["date"], path))
+            if e["is_directory"]:
+                subdirs.append(e["name"])
+
+        # Queue the next level first so it downloads while this one is logged
+        if depth < MAX_DEPTH:
+            for name in subdirs[:MAX_SUBDIRS]:
+                queue.put_nowait((f"{path}{name}/", depth + 1))
+
+        all_entries.extend(db_entries)
+        if logger.isEnabledFor(logging.DEBUG):
+            for entry in db_entries:
+                logger.debug("  %s %s → collection=%s, platform=%s, region=%s",
+                             "DIR" if entry["is_directory"] else "FILE",
+                             entry["name"][:60],
+                             entry["collection"], entry["platform"], entry["region"])
+
+    async def worker(session, queue: asyncio.Queue):
+        while True:
+            path, depth = await queue.get()
+            try:
+                await crawl_listing(session, path, depth, queue)
+            except Exception as e:
+                logger.warning("Error crawling %s: %s", path or "/", e)
+            finally:
+                queue.task_done()
+
+    # One host: keep connections alive and cache the DNS lookup
+    connector = aiohttp.TCPConnector(limit=20, limit_per_host=20,
+                                     ttl_dns_cache=300, enable_cleanup_closed=True)
     async with aiohttp.ClientSession(
+        connector=connector,
         headers={"User-Agent": "MyrientSearchTest/1.0"}
     ) as session:
-
-        # 1. Fetch root listing
-        logger.info("Fetching root: %s", MYRIENT_BASE_URL)
-        async with session.get(MYRIENT_BASE_URL) as resp:
-            html = await resp.text()
-            logger.info("Root page: HTTP %d, %d bytes", resp.status, len(html))
-
-        entries = parse_directory_listing(html)
-        logger.info("Root has %d entries", len(entries))
-
-        # Show first 10 entries
-        for e in entries[:10]:
-            logger.info("  %s %s (size=%s, dir=%s)",
-                        "DIR" if e["is_directory"] else "FILE",
-                        e["name"], e["size"], e["is_directory"])
-
-        # Build and insert root entries
-        root_db_entries = []
-        first_subdir = None
-        for e in entries:
-            entry = build_entry(e["href"], e["name"], e["is_directory"],
-                                e["size"], e["date"], "")
-            root_db_entries.append(entry)
-            if e["is_directory"] and first_subdir is None:
-                first_subdir = e["name"]
-
-        db.insert_entries_batch(root_db_entries)
-        logger.info("Inserted %d root entries into DB", len(root_db_entries))
-
-        # 2. Fetch a subdirectory to test deeper parsing
-        if first_subdir:
-            sub_url = MYRIENT_BASE_URL + first_subdir + "/"
-            logger.info("Fetching subdirectory: %s", sub_url)
-            async with session.get(sub_url) as resp:
-                html = await resp.text()
-
-            sub_entries = parse_directory_listing(html)
-            logger.info("Subdirectory '%s' has %d entries", first_subdir, len(sub_entries))
-
-            sub_db_entries = []
-            for e in sub_entries[:50]:  # Limit for test
-                entry = build_entry(e["href"], e["name"], e["is_directory"],
-                                    e["size"], e["date"], first_subdir + "/")
-                sub_db_entries.append(entry)
-                logger.info("  %s %s → collection=%s, platform=%s, region=%s",
-                            "DIR" if e["is_directory"] else "FILE",
-                            e["name"][:60],
-                            entry["collection"], entry["platform"], entry["region"])
-
-            db.insert_entries_batch(sub_db_entries)
-            logger.info("Inserted %d sub-entries into DB", len(sub_db_entries))
-
-            # 2b. Go one level deeper if there's a subdirectory
-            deeper_dir = next((e for e in sub_entries if e["is_directory"]), None)
-            if deeper_dir:
-                deeper_path = first_subdir + "/" + deeper_dir["name"] + "/"
-                deeper_url = MYRIENT_BASE_URL + deeper_path
-                logger.info("Fetching deeper: %s", deeper_url)
-                async with session.get(deeper_url) as resp:
-                    html = await resp.text()
-
-                deeper_entries = parse_directory_listing(html)
-                logger.info("Deep dir '%s' has %d entries", deeper_dir["name"], len(deeper_entries))
-
-                deeper_db_entries = []
-                for e in deeper_entries[:30]:
-                    entry = build_entry(e["href"], e["name"], e["is_directory"],
-                                        e["size"], e["date"], deeper_path)
-                    deeper_db_entries.append(entry)
-
-                db.insert_entries_batch(deeper_db_entries)
-                logger.info("Inserted %d deep entries into DB", len(deeper_db_entries))
-
-    # 3. Test search
+        queue: asyncio.Queue[tuple[str, int]] = asyncio.Queue()
+        queue.put_nowait(("", 0))
+        async with asyncio.TaskGroup() as tg:
+            workers = [tg.create_task(worker(session, queue)) for _ in range(WORKERS)]
+            await queue.join()
+            for w in workers:
+                w.cancel()
+
+    # One executemany in one transaction for the whole run
+    db.insert_entries_batch(all_entries)
+    logger.info("Inserted %d entries into DB", len(all_entries))
+    # Same post-sync maintenance as run_sync, so the planner has stats
+    db.optimize()
+
+    # Test search
     logger.info("\n── Testing search ──")
     stats = db.get_stats()
     logger.info("DB stats: %s", stats)
@@ -118,8 +130,18 @@ async def test_fetch_and_parse():
         for r in results["results"]:
             logger.info("  → %s (collection=%s)", r["name"][:60], r["collection"])
 
+    # Platform scans are cached per directory, shared by its files
+    logger.info("Platform directory cache: %s", _platform_for_dir.cache_info())
+
     logger.info("\nTest complete!")
 
 
 if __name__ == "__main__":
+    # Ensure we can import from project root
+    sys.path.insert(0, os.path.dirname(__file__))
+
+    # Override config for testing
+    os.environ["DATA_DIR"] = os.path.join(os.path.dirname(__file__), "data")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
     asyncio.run(test_fetch_and_parse())